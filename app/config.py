@@ -4,9 +4,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # API Keys
-AIPROXY_TOKEN = os.getenv("AIPROXY_TOKEN")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+AIPROXY_TOKEN = os.getenv("AIPROXY_TOKEN", "").strip() or None
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip() or None
+OPENAI_BASE_URL = os.getenv(
+    "OPENAI_BASE_URL",
+    "https://aiproxy.sanand.workers.dev/openai/v1" if AIPROXY_TOKEN else "https://api.openai.com/v1"
+)
 
 # Server Config
 HOST = os.getenv("HOST", "0.0.0.0")
@@ -18,9 +21,116 @@ USER_SECRET = os.getenv("USER_SECRET", "default_secret")
 # Limits
 MAX_RETRIES = 3
 GLOBAL_TIMEOUT_SECONDS = 300  # 5 minutes
+# Seconds kept back from every stage so a best answer can still be submitted
+DEADLINE_SUBMIT_RESERVE_SECONDS = float(os.getenv("DEADLINE_SUBMIT_RESERVE_SECONDS", 10))
+# Optional stages (vision extraction) are skipped when less than this is left
+DEADLINE_VISION_MIN_SECONDS = float(os.getenv("DEADLINE_VISION_MIN_SECONDS", 60))
 TOKEN_BUDGET_LIMIT = 2.0      # $2.00
 
+# LLM Client
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 50))
+LLM_DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", 8))
+# Per-model in-flight limits, e.g. "gpt-4o:8,gpt-4o-mini:16"
+LLM_MODEL_CONCURRENCY = {
+    name.strip(): int(limit)
+    for name, limit in (
+        item.split(":") for item in os.getenv("LLM_MODEL_CONCURRENCY", "gpt-4o:8,gpt-4o-mini:16").split(",") if item
+    )
+}
+
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMP_DIR = os.path.join(BASE_DIR, "temp")
 os.makedirs(TEMP_DIR, exist_ok=True)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+os.makedirs(CACHE_DIR, exist_ok=True)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Browser Pool
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 3))
+BROWSER_CONTEXT_MAX_USES = int(os.getenv("BROWSER_CONTEXT_MAX_USES", 25))
+# After a browser-agent action: the DOM must stay unchanged this long (and no request in flight)
+BROWSER_SETTLE_QUIET_MS = int(os.getenv("BROWSER_SETTLE_QUIET_MS", 300))
+BROWSER_SETTLE_TIMEOUT_MS = int(os.getenv("BROWSER_SETTLE_TIMEOUT_MS", 3000))
+# Perceptual hash bits (of 64) that must differ before the agent gets a new screenshot
+BROWSER_SCREENSHOT_DISTANCE = int(os.getenv("BROWSER_SCREENSHOT_DISTANCE", 6))
+# Per action of a browser-agent plan, and for its expected post-condition to show up
+BROWSER_ACTION_TIMEOUT_MS = int(os.getenv("BROWSER_ACTION_TIMEOUT_MS", 3000))
+# Request interception for every pooled context (see app.services.request_router)
+BROWSER_BLOCK_RESOURCE_TYPES = {
+    item.strip() for item in os.getenv("BROWSER_BLOCK_RESOURCE_TYPES", "font,media").split(",") if item.strip()
+}
+BROWSER_BLOCK_DOMAINS = [
+    item.strip() for item in os.getenv(
+        "BROWSER_BLOCK_DOMAINS",
+        "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,hotjar.com,segment.io,mixpanel.com,clarity.ms"
+    ).split(",") if item.strip()
+]
+BROWSER_ASSET_CACHE_TYPES = {
+    item.strip() for item in os.getenv("BROWSER_ASSET_CACHE_TYPES", "stylesheet,image,script").split(",") if item.strip()
+}
+BROWSER_ASSET_CACHE_MAX_BYTES = int(os.getenv("BROWSER_ASSET_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+BROWSER_ASSET_CACHE_TTL_SECONDS = int(os.getenv("BROWSER_ASSET_CACHE_TTL_SECONDS", 300))
+# A page is ready once this element has text; pages without it are ready when the DOM settles
+BROWSER_READY_SELECTOR = os.getenv("BROWSER_READY_SELECTOR", "#result")
+
+# LLM Response Cache
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 3600))
+# Set to an empty string to disable the on-disk tier
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite3"))
+
+# Sandbox Workers
+SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", 2))
+SANDBOX_MAX_JOBS_PER_WORKER = int(os.getenv("SANDBOX_MAX_JOBS_PER_WORKER", 20))
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", 2048))
+SANDBOX_MAX_OUTPUT_CHARS = int(os.getenv("SANDBOX_MAX_OUTPUT_CHARS", 1_000_000))  # per stream, tail is kept
+
+# Task Store
+TASK_STORE_BACKEND = os.getenv("TASK_STORE_BACKEND", "sqlite")  # "sqlite" | "memory"
+TASK_STORE_PATH = os.getenv("TASK_STORE_PATH", os.path.join(DATA_DIR, "tasks.sqlite3"))
+TASK_RETENTION_SECONDS = int(os.getenv("TASK_RETENTION_SECONDS", 7 * 24 * 3600))
+# Unfinished tasks not updated for this long were left behind by a crashed or stopped worker
+TASK_STALE_SECONDS = int(os.getenv("TASK_STALE_SECONDS", 3600))
+TASK_MAX_LOGS = int(os.getenv("TASK_MAX_LOGS", 2000))  # per task, memory backend
+TASK_LOG_BATCH_SIZE = int(os.getenv("TASK_LOG_BATCH_SIZE", 25))
+TASK_LOG_FLUSH_INTERVAL = float(os.getenv("TASK_LOG_FLUSH_INTERVAL", 0.5))
+
+# Scheduler
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 4))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", 100))
+SCHEDULER_MAX_PER_EMAIL = int(os.getenv("SCHEDULER_MAX_PER_EMAIL", 10))
+
+# Shared HTTP Client (submissions and downloads)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 10))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))  # idempotent requests only
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", 0.5))
+
+# Audio
+AUDIO_CHUNK_SECONDS = int(os.getenv("AUDIO_CHUNK_SECONDS", 120))  # segment length for parallel transcription
+AUDIO_SPLIT_MIN_BYTES = int(os.getenv("AUDIO_SPLIT_MIN_BYTES", 2 * 1024 * 1024))  # smaller files go in one request
+
+# Vision Images
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp")  # "webp" | "jpeg"
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 80))
+IMAGE_MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", 1024))  # wider shots are downscaled before upload
+IMAGE_TILE_HEIGHT = int(os.getenv("IMAGE_TILE_HEIGHT", 1536))  # tall pages are cut into tiles of this height
+IMAGE_MAX_TILES = int(os.getenv("IMAGE_MAX_TILES", 4))
+# Pages with at least this much DOM text and no img/canvas/svg are solved without a screenshot
+IMAGE_SKIP_TEXT_CHARS = int(os.getenv("IMAGE_SKIP_TEXT_CHARS", 200))
+
+# Artifact Cache (downloaded quiz data files)
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(CACHE_DIR, "artifacts"))
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Entries younger than this are served without revalidating (ETag/Last-Modified) first
+ARTIFACT_CACHE_FRESH_SECONDS = int(os.getenv("ARTIFACT_CACHE_FRESH_SECONDS", 300))
+
+# Answer Cache (verified programs keyed on normalized quiz content)
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(DATA_DIR, "answers.sqlite3"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+# Program Library (verified programs re-parameterised for quizzes from the same template)
+PROGRAM_LIBRARY_PATH = os.getenv("PROGRAM_LIBRARY_PATH", os.path.join(DATA_DIR, "programs.sqlite3"))
+PROGRAM_LIBRARY_TTL_SECONDS = int(os.getenv("PROGRAM_LIBRARY_TTL_SECONDS", 30 * 24 * 3600))
@@ -1,11 +1,12 @@
+import asyncio
 import os
-import httpx
-import uuid
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.handlers.base_handler import BaseHandler
 from app.services.llm_service import llm_client
+from app.services.artifact_cache import artifact_cache
+from app.utils.audio_chunks import split_audio, remove_files
 from app.utils.logger import setup_logger
-from app.config import TEMP_DIR
+from app.config import TEMP_DIR, AUDIO_CHUNK_SECONDS, AUDIO_SPLIT_MIN_BYTES, DEADLINE_SUBMIT_RESERVE_SECONDS
 
 logger = setup_logger(__name__)
 
@@ -13,50 +14,51 @@ class AudioHandler(BaseHandler):
     async def handle(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Downloads audio, transcribes it, and answers the question.
+        The file comes from the shared artifact cache, so a prefetch already under way is reused.
         """
         audio_url = task_data.get("audio_url")
         question = task_data.get("question")
+        deadline = task_data.get("deadline")
         
         if not audio_url:
             raise ValueError("AudioHandler requires 'audio_url'")
 
-        # 1. Download Audio
-        audio_path = await self._download_audio(audio_url)
-        
-        try:
-            # 2. Transcribe
-            transcript = await self._transcribe(audio_path)
-            logger.info(f"Transcript: {transcript[:100]}...")
-            
-            # 3. Answer Question
-            return self._solve_with_transcript(transcript, question)
-        finally:
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+        def budget(default: float) -> float:
+            # Every stage leaves the submit reserve untouched
+            return deadline.timeout(default, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else default
 
-    async def _download_audio(self, url: str) -> str:
-        filename = os.path.join(TEMP_DIR, f"audio_{uuid.uuid4().hex}.mp3")
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            with open(filename, "wb") as f:
-                f.write(resp.content)
-        return filename
+        # 1. Download Audio (shielded: a deadline hit must not abort the shared download)
+        artifact = await asyncio.wait_for(asyncio.shield(artifact_cache.fetch(audio_url)), timeout=budget(60))
+        logger.info(f"Audio ready ({artifact['size']} bytes, cached={artifact['cached']})")
+        
+        # 2. Transcribe
+        transcript = await asyncio.wait_for(self._transcribe(artifact["path"]), timeout=budget(120))
+        logger.info(f"Transcript: {transcript[:100]}...")
+        
+        # 3. Answer Question
+        return await self._solve_with_transcript(transcript, question, timeout=budget(60))
 
     async def _transcribe(self, file_path: str) -> str:
-        # Use OpenAI Whisper API
+        """
+        Long files are cut into segments that are transcribed concurrently (bounded by the
+        whisper-1 limit in llm_client) and joined in playback order.
+        """
+        chunks = [file_path]
+        if os.path.getsize(file_path) > AUDIO_SPLIT_MIN_BYTES:
+            chunks = await split_audio(file_path, AUDIO_CHUNK_SECONDS, TEMP_DIR)
         try:
-            with open(file_path, "rb") as audio_file:
-                transcript = llm_client.client.audio.transcriptions.create(
-                    model="whisper-1", 
-                    file=audio_file
-                )
-            return transcript.text
+            if len(chunks) > 1:
+                logger.info(f"Transcribing {len(chunks)} audio segments in parallel")
+            # Use OpenAI Whisper API
+            parts = await asyncio.gather(*(llm_client.transcribe(chunk) for chunk in chunks))
+            return " ".join(part.strip() for part in parts if part)
         except Exception as e:
             logger.error(f"Transcription failed: {e}")
             raise
+        finally:
+            remove_files([chunk for chunk in chunks if chunk != file_path])
 
-    def _solve_with_transcript(self, transcript: str, question: str) -> Dict[str, Any]:
+    async def _solve_with_transcript(self, transcript: str, question: str, timeout: Optional[float] = None) -> Dict[str, Any]:
         prompt = f"Transcript: {transcript}\n\nQuestion: {question}\n\nExtract the answer as JSON: {{'answer': ...}}"
-        response = llm_client.call([{"role": "user", "content": prompt}], model="gpt-4o-mini")
+        response = await llm_client.call([{"role": "user", "content": prompt}], model="gpt-4o-mini", timeout=timeout)
         return llm_client.parse_json(response)
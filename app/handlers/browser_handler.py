@@ -1,48 +1,84 @@
 import asyncio
-import base64
 import json
-from typing import Dict, Any, List
-from playwright.async_api import async_playwright
+from typing import Dict, Any, List, Optional, Tuple
 from app.handlers.base_handler import BaseHandler
 from app.utils.logger import setup_logger
 from app.services.llm_service import llm_client
+from app.services.browser_pool import browser_pool
+from app.services.metrics import metrics
+from app.utils.image_prep import capture_page, image_fingerprint, visual_distance
+from app.utils.page_observe import NetworkTracker, outline_page, diff_outline, describe_diff, settle
+from app.config import DEADLINE_SUBMIT_RESERVE_SECONDS, BROWSER_SCREENSHOT_DISTANCE, BROWSER_ACTION_TIMEOUT_MS
 
 logger = setup_logger(__name__)
 
+# Upper bound on the actions one LLM turn may plan
+MAX_PLAN_ACTIONS = 12
+
 class BrowserHandler(BaseHandler):
     async def handle(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         url = task_data.get("url")
         question = task_data.get("question", "Solve the task on this page.")
+        deadline = task_data.get("deadline")
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            
+        async with browser_pool.page() as page:
+            tracker = NetworkTracker(page)
             try:
                 await page.goto(url)
-                await page.wait_for_load_state("networkidle")
+                await settle(page, tracker)
                 
-                # Agentic Loop
+                # Agentic Loop: one conversation, later turns only carry what changed
+                history: List[Dict[str, Any]] = []
+                outline, fingerprint = None, None
+                report = ""
                 max_steps = 5
                 for step in range(max_steps):
+                    # Another observe/decide round would not leave time to submit
+                    if deadline and not deadline.allows(DEADLINE_SUBMIT_RESERVE_SECONDS * 2):
+                        logger.warning(f"Stopping browser loop, {deadline}")
+                        break
                     logger.info(f"Browser Step {step+1}/{max_steps}")
                     
                     # 1. Observe
                     title = await page.title()
-                    screenshot_bytes = await page.screenshot()
-                    screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+                    previous_outline, outline = outline, await outline_page(page)
+                    # The agent acts on what is visible, so capture the viewport
+                    capture = await capture_page(page, "", full_page=False, force=True)
+                    previous_fingerprint = fingerprint
+                    fingerprint = await asyncio.to_thread(image_fingerprint, capture["images"][0]) if capture["images"] else None
+                    changed = visual_distance(previous_fingerprint, fingerprint) > BROWSER_SCREENSHOT_DISTANCE
+                    if previous_outline is None:
+                        text = f"Question: {question}\nTitle: {title}\nPage elements:\n" + "\n".join(outline)
+                    else:
+                        text = f"{report}\nTitle: {title}\n" + describe_diff(diff_outline(previous_outline, outline))
+                    if changed:
+                        self._drop_images(history)
+                    else:
+                        text += "\nLayout unchanged since the last screenshot."
+                    logger.info(f"Observation: {len(text)} chars, screenshot {'sent' if changed else 'skipped'}")
+                    history.append({"role": "user", "content": [
+                        {"type": "text", "text": text},
+                        *({"type": "image_url", "image_url": {"url": image}} for image in (capture["images"] if changed else []))
+                    ]})
                     
                     # 2. Decide
-                    action = self._decide_action(question, title, screenshot_b64)
+                    with metrics.span("vision" if changed else "analyze") as span:
+                        span.add(bytes_out=sum(len(image) for image in capture["images"]) if changed else 0)
+                        action = await self._decide_action(
+                            history,
+                            timeout=deadline.timeout(60, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else None
+                        )
+                    history.append({"role": "assistant", "content": json.dumps(action)})
                     logger.info(f"Decided Action: {action}")
                     
                     if action["type"] == "done":
                         return {"answer": action["answer"], "submit_url": url}
                     
-                    # 3. Act
-                    await self._execute_action(page, action)
-                    await page.wait_for_timeout(1000) # Wait for UI update
+                    # 3. Act: the whole plan runs without another LLM round trip unless a step fails
+                    actions = ((action.get("actions") or []) if action["type"] == "plan" else [action])[:MAX_PLAN_ACTIONS]
+                    executed, failure = await self._run_plan(page, actions, tracker)
+                    report = f"Executed {executed}/{len(actions)} actions." + (f" Stopped: {failure}" if failure else "")
+                    logger.info(report)
                     
                 # If loop finishes without "done", try to extract anyway
                 return {"error": "Max steps reached without solution"}
@@ -51,34 +87,83 @@ class BrowserHandler(BaseHandler):
                 logger.error(f"Browser error: {e}")
                 raise
             finally:
-                await browser.close()
+                tracker.detach()
+
+    @staticmethod
+    def _drop_images(history: List[Dict[str, Any]]):
+        # Only the newest screenshot stays in the conversation; older ones are re-sent tokens for nothing
+        for message in history:
+            if message["role"] == "user" and isinstance(message["content"], list):
+                message["content"] = [part for part in message["content"] if part["type"] != "image_url"]
 
-    def _decide_action(self, question: str, title: str, screenshot_b64: str) -> Dict[str, Any]:
+    async def _decide_action(self, history: List[Dict[str, Any]], timeout: float = None) -> Dict[str, Any]:
         system_prompt = """
         You are a web automation agent. 
         Goal: Solve the user's question.
-        Input: Page title and screenshot.
+        Input: Question, page title and a list of the visible page elements, with a screenshot.
+        After each of your actions you only get the element changes, plus a new screenshot
+        if the layout changed visibly.
         Output JSON:
         - If solved: {"type": "done", "answer": "..."}
-        - If interaction needed: {"type": "click" | "type", "selector": "...", "value": "..." (if type)}
+        - If interaction needed, every action you can already plan (e.g. all fields of a form, then submit):
+          {"type": "plan", "actions": [
+            {"type": "click" | "type" | "select" | "press", "selector": "...", "value": "..." (type/select/press),
+             "expect": {"selector": "...", "text": "..." (optional)} (optional: what must be visible afterwards)}
+          ]}
+        Actions run in order and stop at the first failure or unmet expectation; you'll be told how far it got.
         """
-        user_content = [
-            {"type": "text", "text": f"Question: {question}\nTitle: {title}"},
-            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{screenshot_b64}"}}
-        ]
-        
-        response = llm_client.call(
-            [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}],
+        response = await llm_client.call(
+            [{"role": "system", "content": system_prompt}, *history],
             model="gpt-4o",
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            timeout=timeout
         )
         return llm_client.parse_json(response)
 
-    async def _execute_action(self, page, action: Dict[str, Any]):
+    async def _run_plan(self, page, actions: List[Dict[str, Any]], tracker: NetworkTracker = None) -> Tuple[int, Optional[str]]:
+        """
+        Executes actions back to back. Returns (actions completed, why it stopped early or None).
+        Clicks without an expectation wait for the page to settle before the next action.
+        """
+        for index, action in enumerate(actions):
+            failure = await self._execute_action(page, action)
+            if not failure and action.get("expect"):
+                failure = await self._check_expectation(page, action["expect"])
+            elif not failure and action["type"] == "click":
+                await settle(page, tracker)
+            if failure:
+                return index, f"action {index + 1} ({action['type']} {action.get('selector')}): {failure}"
+        await settle(page, tracker)
+        return len(actions), None
+
+    async def _execute_action(self, page, action: Dict[str, Any]) -> Optional[str]:
+        selector, value = action.get("selector"), action.get("value")
         try:
             if action["type"] == "click":
-                await page.click(action["selector"])
+                await page.click(selector, timeout=BROWSER_ACTION_TIMEOUT_MS)
             elif action["type"] == "type":
-                await page.fill(action["selector"], action["value"])
+                await page.fill(selector, str(value), timeout=BROWSER_ACTION_TIMEOUT_MS)
+            elif action["type"] == "select":
+                await page.select_option(selector, str(value), timeout=BROWSER_ACTION_TIMEOUT_MS)
+            elif action["type"] == "press":
+                await page.press(selector, str(value), timeout=BROWSER_ACTION_TIMEOUT_MS)
+            else:
+                return f"unknown action type {action['type']!r}"
         except Exception as e:
             logger.warning(f"Action failed: {e}")
+            return str(e).splitlines()[0]
+        return None
+
+    async def _check_expectation(self, page, expect: Dict[str, Any]) -> Optional[str]:
+        selector, text = expect.get("selector"), expect.get("text")
+        try:
+            if selector:
+                await page.locator(selector).first.wait_for(state="visible", timeout=BROWSER_ACTION_TIMEOUT_MS)
+            if text:
+                await page.wait_for_function(
+                    "([selector, text]) => (selector ? document.querySelector(selector) : document.body)?.innerText.includes(text)",
+                    arg=[selector, text], timeout=BROWSER_ACTION_TIMEOUT_MS
+                )
+        except Exception:
+            return f"expected {selector or 'page'} to show {text!r}" if text else f"expected {selector} to be visible"
+        return None
@@ -1,14 +1,13 @@
-import subprocess
-import sys
-import os
-import uuid
-import json
-import re
+import asyncio
 from typing import Dict, Any, Optional
 from app.handlers.base_handler import BaseHandler
 from app.services.llm_service import llm_client
+from app.services.sandbox import sandbox_pool
+from app.services.artifact_cache import describe_artifacts, prepared_tables
+from app.services.metrics import metrics
+from app.config import DEADLINE_SUBMIT_RESERVE_SECONDS
+from app.utils.json_extract import extract_json
 from app.utils.logger import setup_logger
-from app.config import TEMP_DIR
 
 logger = setup_logger(__name__)
 
@@ -20,16 +19,29 @@ class DataHandler(BaseHandler):
         3. Executes code and parses the messy output (Robust Parsing).
         """
         context = task_data.get("context", "")
+        deadline = task_data.get("deadline")
+        # Linked data files were prefetched in the background; read them from the shared cache
+        artifacts = await self._await_prefetch(task_data.get("prefetch"), deadline)
         # If we have a screenshot, we would pass it here, but let's focus on the text/code flow first.
         
         # --- Step 1: Reasoning & Code Generation ---
-        code = self._generate_robust_code(context)
+        with metrics.span("codegen"):
+            code = await self._generate_robust_code(
+                context, artifacts, timeout=deadline.timeout(120, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else None
+            )
         
         # --- Step 2: Execution ---
-        execution_output = self._execute_code(code)
+        with metrics.span("execute") as span:
+            execution_output = await self._execute_code(
+                code, timeout=deadline.timeout(45, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else 45,
+                tables=prepared_tables(artifacts)
+            )
+            span.add(bytes_out=len(code), bytes_in=len(execution_output))
+            if not execution_output:
+                span.outcome = "error"
         
         # --- Step 3: Robust Parsing (The Fix for Point 3) ---
-        result_json = self._extract_json_from_output(execution_output)
+        result_json = extract_json(execution_output)
         
         if not result_json:
             logger.error(f"Failed to extract JSON from output: {execution_output}")
@@ -37,7 +49,18 @@ class DataHandler(BaseHandler):
 
         return result_json
 
-    def _generate_robust_code(self, context: str) -> str:
+    async def _await_prefetch(self, prefetch: Optional[asyncio.Task], deadline=None) -> Dict[str, Dict[str, Any]]:
+        if not prefetch:
+            return {}
+        try:
+            # Shielded: giving up on the wait (or being cancelled) must not abort shared downloads
+            wait = deadline.timeout(60, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else 60
+            return await asyncio.wait_for(asyncio.shield(prefetch), timeout=wait)
+        except asyncio.TimeoutError:
+            logger.warning("Prefetch too slow, generated code will download the files itself")
+            return {}
+
+    async def _generate_robust_code(self, context: str, artifacts: Optional[Dict[str, Dict[str, Any]]] = None, timeout: Optional[float] = None) -> str:
         """
         Generates a script that includes the context variable directly.
         """
@@ -51,7 +74,7 @@ Output: Return ONLY valid Python code. No markdown.
 
 Requirements:
 1. You must parse the 'context' text provided in the variable.
-2. If the context contains a URL to a CSV/Excel/PDF, use `requests` to download it.
+2. If the context contains a URL to a CSV/Excel/PDF, use `requests` to download it, unless a local path is listed for it.
 3. Use pandas, numpy, or beautifulsoup4 as needed.
 4. FINAL OUTPUT: Print a valid JSON string to stdout. 
    Format: {"answer": <the_result>, "submit_url": "<url_to_submit_to>"}
@@ -63,11 +86,13 @@ Here is the task context text:
 {safe_context}
 \"\"\"
 
+{describe_artifacts(artifacts or {})}
 Write the solution script.
 """
-        response = llm_client.call(
+        response = await llm_client.call(
             [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-            model="gpt-4o"
+            model="gpt-4o",
+            timeout=timeout
         )
         
         # Clean Markdown
@@ -79,77 +104,23 @@ Write the solution script.
             
         return code.strip()
 
-    def _execute_code(self, code: str) -> str:
-        filename = os.path.join(TEMP_DIR, f"solve_{uuid.uuid4().hex}.py")
-        
+    async def _execute_code(self, code: str, timeout: float = 45, tables: Optional[Dict[str, str]] = None) -> str:
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(code)
-            
             logger.info(f"Executing logic...")
             # Run with a timeout to prevent hanging
-            result = subprocess.run(
-                [sys.executable, filename],
-                capture_output=True,
-                text=True,
-                timeout=45
-            )
+            result = await sandbox_pool.run(code, timeout=timeout, tables=tables)
             
             # Combine stdout and stderr for debugging, but we mostly care about stdout for the answer
-            full_output = result.stdout
-            if result.stderr:
-                logger.warning(f"Script Stderr: {result.stderr}")
+            full_output = result["stdout"]
+            if result["stderr"]:
+                logger.warning(f"Script Stderr: {result['stderr']}")
                 
-            if result.returncode != 0:
-                logger.error(f"Script execution failed. Stderr: {result.stderr}")
-                raise Exception(f"Code execution error: {result.stderr}")
+            if result["returncode"] != 0:
+                logger.error(f"Script execution failed. Stderr: {result['stderr']}")
+                raise Exception(f"Code execution error: {result['stderr']}")
                 
             return full_output
             
         except Exception as e:
             logger.error(f"Execution wrapper failed: {e}")
             return ""
-        finally:
-            if os.path.exists(filename):
-                os.remove(filename)
-
-    def _extract_json_from_output(self, output: str) -> Optional[Dict[str, Any]]:
-        """
-        Scans string for a JSON object. Handles messy stdout.
-        """
-        try:
-            # 1. Try pure parse (rarely works with raw scripts)
-            return json.loads(output.strip())
-        except json.JSONDecodeError:
-            pass
-
-        # 2. Regex Search: Find the LAST occurrence of a pattern looking like {"...": ...}
-        # We look for the largest valid JSON block.
-        try:
-            # This regex finds a string starting with { and ending with } 
-            # DOTALL allows it to match across multiple lines
-            matches = re.findall(r'\{.*\}', output, re.DOTALL)
-            
-            if matches:
-                # Try the last match first (as the answer is usually printed last)
-                last_match = matches[-1]
-                try:
-                    return json.loads(last_match)
-                except:
-                    # If that fails, try to repair common issues or try earlier matches
-                    pass
-                    
-            # 3. Fallback: Sometimes LLMs output: Answer: {"key": "value"}
-            # Let's try to find the specific "answer" key
-            if '"answer":' in output:
-                 # Clean up the string to find the start and end of the JSON structure
-                 start = output.find('{')
-                 end = output.rfind('}') + 1
-                 if start != -1 and end != -1:
-                     json_str = output[start:end]
-                     return json.loads(json_str)
-
-        except Exception as e:
-            logger.error(f"JSON extraction failed: {e}")
-            
-        return None
@@ -1,29 +1,77 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from app.orchestrator import orchestrator
-from app.config import HOST, PORT
+from app.services.browser_pool import browser_pool
+from app.services.llm_service import llm_client
+from app.services.sandbox import sandbox_pool
+from app.services.http_client import http_client
+from app.services.task_store import task_store
+from app.services.scheduler import task_scheduler, QueueFullError
+from app.services.artifact_cache import artifact_cache
+from app.services.request_router import request_router
+from app.services.task_fetcher import task_fetcher
+from app.services.metrics import metrics
+from app.config import HOST, PORT, GLOBAL_TIMEOUT_SECONDS
+from app.utils.deadline import Deadline
 import uvicorn
 import os
 
 app = FastAPI(title="TDS Project 2 - Advanced Solver")
 
+metrics.add_collector("llm", lambda: {"cost_usd": llm_client.total_cost, **{f"cache_{k}": v for k, v in llm_client.cache.stats.items()}})
+metrics.add_collector("queue", task_scheduler.snapshot)
+metrics.add_collector("fetch", lambda: task_fetcher.stats)
+metrics.add_collector("http", lambda: http_client.stats)
+metrics.add_collector("browser_requests", request_router.snapshot)
+metrics.add_collector("artifacts", artifact_cache.snapshot)
+
 class RunRequest(BaseModel):
     email: str
     secret: str
     url: str
 
 @app.post("/run")
-async def run_task(request: RunRequest, background_tasks: BackgroundTasks):
+async def run_task(request: RunRequest):
     # Validate secret
     if request.secret != os.getenv("USER_SECRET", "default_secret"):
         raise HTTPException(status_code=403, detail="Invalid secret")
         
-    background_tasks.add_task(orchestrator.run, request.url, request.email, request.secret)
-    return {"status": "started", "message": "Task processing started in background"}
+    deadline = Deadline(GLOBAL_TIMEOUT_SECONDS)
+    try:
+        task_scheduler.submit(
+            request.email,
+            lambda: orchestrator.run(request.url, request.email, request.secret, deadline),
+            deadline=deadline.expires_at
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    return {"status": "queued", "message": "Task queued for processing", "queue": task_scheduler.snapshot()}
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def startup():
+    await task_store.start()
+    await task_scheduler.start()
+    await browser_pool.start()
+    await sandbox_pool.start()
+    await http_client.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await task_scheduler.stop()
+    await browser_pool.stop()
+    await sandbox_pool.stop()
+    await http_client.stop()
+    await llm_client.close()
+    await task_store.stop()
+
 if __name__ == "__main__":
     uvicorn.run(app, host=HOST, port=PORT)
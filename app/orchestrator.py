@@ -1,12 +1,17 @@
 import asyncio
 from typing import Dict, Any, Optional
 from app.services.task_fetcher import task_fetcher
+from app.services.artifact_cache import artifact_cache
 from app.services.submission import submission_service
 from app.services.llm_service import llm_client
 from app.services.state_manager import state_manager
+from app.services.metrics import metrics
 from app.handlers.browser_handler import BrowserHandler
 from app.handlers.data_handler import DataHandler
 from app.handlers.audio_handler import AudioHandler
+from app.config import GLOBAL_TIMEOUT_SECONDS, DEADLINE_SUBMIT_RESERVE_SECONDS
+from app.utils.deadline import Deadline
+from app.utils.page_extract import classify, summarize
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -17,36 +22,47 @@ class Orchestrator:
         self.data_handler = DataHandler()
         self.audio_handler = AudioHandler()
         
-    async def run(self, initial_url: str, email: str, secret: str):
+    async def run(self, initial_url: str, email: str, secret: str, deadline: Optional[Deadline] = None):
         task_id = state_manager.create_task(email, initial_url)
         state_manager.update_status(task_id, "processing")
         logger.info(f"Starting Task {task_id}")
         
+        deadline = deadline or Deadline(GLOBAL_TIMEOUT_SECONDS)
         current_url = initial_url
         
         for step in range(10): # Safety limit
+            if not deadline.allows(DEADLINE_SUBMIT_RESERVE_SECONDS * 2):
+                logger.warning(f"Deadline approaching ({deadline}), stopping chain")
+                state_manager.update_status(task_id, "timeout")
+                break
             logger.info(f"--- Step {step + 1} ---")
+            metrics.set_tags(task_id=task_id, step=step + 1)
             state_manager.log(task_id, f"Step {step+1}: Processing {current_url}")
             
             try:
                 # 1. Fetch & Classify
-                content = await task_fetcher.fetch(current_url)
-                task_type = self._classify_task(content)
+                with metrics.span("scrape") as span:
+                    page = await task_fetcher.fetch(
+                        current_url, timeout=deadline.timeout(30, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS)
+                    )
+                    span.outcome = page["tier"]
+                    span.add(bytes_in=len(page["html"]))
+                task_type = await self._classify_task(page)
                 logger.info(f"Task Type: {task_type}")
                 state_manager.log(task_id, f"Classified as {task_type}")
+                # Data links download in the background while the task is solved; the browser
+                # agent never reads them, and the audio handler joins the download through the cache
+                prefetch = artifact_cache.start_prefetch(page["links"]) if task_type != "browser" else None
                 
                 # 2. Solve
                 answer_data = {}
                 if task_type == "browser":
-                    answer_data = await self.browser_handler.handle({"url": current_url})
-                elif task_type == "audio":
-                    # Extract audio URL from content (simplified)
-                    # In reality, we'd parse the HTML to find the <audio> tag or link
-                    audio_url = self._extract_audio_url(content)
-                    answer_data = await self.audio_handler.handle({"audio_url": audio_url, "question": "Transcribe and solve"})
+                    answer_data = await self.browser_handler.handle({"url": current_url, "deadline": deadline})
+                elif task_type == "audio" and page["audio"]:
+                    answer_data = await self.audio_handler.handle({"audio_url": page["audio"][0], "question": page["text"] or "Transcribe and solve", "deadline": deadline})
                 else:
-                    # Default/Text/Data
-                    answer_data = await self.data_handler.handle({"question": "Solve this", "context": content})
+                    # Default/Text/Data: solvers get the structured summary instead of raw HTML
+                    answer_data = await self.data_handler.handle({"question": "Solve this", "context": summarize(page), "prefetch": prefetch, "deadline": deadline})
                 
                 if not answer_data or "answer" not in answer_data:
                     logger.error("No answer generated")
@@ -63,7 +79,9 @@ class Orchestrator:
                 
                 submit_url = answer_data.get("submit_url") or current_url
                 
-                result = await submission_service.submit(submit_url, payload)
+                with metrics.span("submit") as span:
+                    result = await submission_service.submit(submit_url, payload, timeout=deadline.timeout(10))
+                    span.outcome = "correct" if result.get("correct") else "incorrect"
                 state_manager.add_history(task_id, current_url, "submit", str(result))
                 
                 if result.get("correct"):
@@ -84,23 +102,18 @@ class Orchestrator:
                 state_manager.update_status(task_id, "error", str(e))
                 break
 
-    def _classify_task(self, content: str) -> str:
-        if "html" in content.lower() and "<script" in content.lower():
+    async def _classify_task(self, page: Dict[str, Any]) -> str:
+        # Audio sources, tables and data links decide without an LLM call
+        task_type = classify(page)
+        if task_type:
+            return task_type
+        html = page.get("html", "").lower()
+        if "<canvas" in html or "<form" in html:
             return "browser"
-        if ".mp3" in content.lower() or ".wav" in content.lower() or "<audio" in content.lower():
-            return "audio"
-        if "csv" in content.lower() or "json" in content.lower():
-            return "data"
         
-        prompt = f"Classify this task content into 'browser', 'audio', 'data', or 'text'. Content: {content[:500]}"
-        return llm_client.call([{"role": "user", "content": prompt}]).lower().strip()
-
-    def _extract_audio_url(self, content: str) -> str:
-        # Quick hack extraction. Should use BeautifulSoup.
-        import re
-        match = re.search(r'href=[\'"]?(http[^\'" >]+\.(?:mp3|wav))[\'"]?', content)
-        if match:
-            return match.group(1)
-        return ""
+        prompt = f"Classify this task content into 'browser', 'audio', 'data', or 'text'. Content: {summarize(page)[:500]}"
+        with metrics.span("analyze"):
+            response = await llm_client.call([{"role": "user", "content": prompt}])
+        return response.lower().strip()
 
 orchestrator = Orchestrator()
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Iterable, Optional
+from app.config import ANSWER_CACHE_PATH, ANSWER_CACHE_TTL_SECONDS
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Per-user query parameters that appear in quiz links but don't change the task
+USER_PARAM_RE = re.compile(r"([?&](?:email|secret|id|token)=)[^&\s\"'<>]*", re.IGNORECASE)
+
+def mask_user_specifics(text: str) -> str:
+    text = USER_PARAM_RE.sub(r"\1<user>", text)
+    return EMAIL_RE.sub("<email>", text)
+
+def normalize_text(text: str) -> str:
+    """
+    Page text with everything student-specific (emails, per-user query params), case and
+    whitespace differences removed, so the same quiz hashes the same for every student.
+    """
+    return " ".join(mask_user_specifics(text).lower().split())
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def artifacts_hash(artifact_hashes: Iterable[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(artifact_hashes)).encode("utf-8")).hexdigest()
+
+class AnswerCache:
+    """
+    Programs that produced a verified-correct answer, keyed on the normalized page text plus
+    the content hashes of the files it links to. A hit is only trusted after the stored
+    program reproduces the stored answer; an incorrect submission removes the entry.
+    """
+    def __init__(self, path: str = ANSWER_CACHE_PATH, ttl: int = ANSWER_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "invalidated": 0}
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "text_hash TEXT NOT NULL, artifacts_hash TEXT NOT NULL, code TEXT NOT NULL, "
+            "answer TEXT NOT NULL, submit_url TEXT, created_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (text_hash, artifacts_hash))"
+        )
+        self._db.commit()
+
+    def known(self, text: str) -> bool:
+        """
+        Cheap pre-check on the page text alone, so a miss never waits for artifact downloads.
+        Lookups are counted by the caller through record_hit()/record_miss().
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM answers WHERE text_hash = ? AND created_at >= ? LIMIT 1",
+                (text_hash(text), time.time() - self.ttl)
+            ).fetchone()
+        return row is not None
+
+    def get(self, text: str, artifact_hashes: Iterable[str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT code, answer, submit_url FROM answers "
+                "WHERE text_hash = ? AND artifacts_hash = ? AND created_at >= ?",
+                (text_hash(text), artifacts_hash(artifact_hashes), time.time() - self.ttl)
+            ).fetchone()
+        if not row:
+            return None
+        return {"code": row[0], "answer": json.loads(row[1]), "submit_url": row[2]}
+
+    def record_miss(self):
+        self.stats["misses"] += 1
+
+    def record_hit(self, text: str, artifact_hashes: Iterable[str]):
+        self.stats["hits"] += 1
+        with self._lock:
+            self._db.execute(
+                "UPDATE answers SET hits = hits + 1 WHERE text_hash = ? AND artifacts_hash = ?",
+                (text_hash(text), artifacts_hash(artifact_hashes))
+            )
+            self._db.commit()
+
+    def store(self, text: str, artifact_hashes: Iterable[str], code: str, answer: Any, submit_url: Optional[str]):
+        """
+        Call only after the server confirmed `answer` as correct.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (text_hash, artifacts_hash, code, answer, submit_url, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (text_hash(text), artifacts_hash(artifact_hashes), code, json.dumps(answer), submit_url, time.time())
+            )
+            self._db.commit()
+        self.stats["stored"] += 1
+
+    def invalidate(self, text: str, artifact_hashes: Iterable[str]):
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM answers WHERE text_hash = ? AND artifacts_hash = ?",
+                (text_hash(text), artifacts_hash(artifact_hashes))
+            )
+            self._db.commit()
+        if cur.rowcount:
+            self.stats["invalidated"] += 1
+            logger.info("Invalidated cached answer after an incorrect submission")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {**self.stats, "entries": entries}
+
+answer_cache = AnswerCache()
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Any, Iterable, Optional
+from urllib.parse import urlsplit
+from app.config import ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES, ARTIFACT_CACHE_FRESH_SECONDS
+from app.services.http_client import http_client
+from app.utils.tables import convert_table, remove_parsed
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Link kinds (see app.utils.page_extract) worth downloading before generated code asks for them
+PREFETCH_KINDS = ("data", "pdf", "audio")
+
+def _sha256_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+class ArtifactCache:
+    """
+    Local cache for quiz data files (CSV/PDF/Excel/audio), shared by every chain and retry.
+    Files are stored by SHA-256 of their content, so two URLs serving the same bytes share one
+    copy. A SQLite index maps URL -> file with its ETag/Last-Modified for conditional
+    revalidation, and least recently used files are evicted above max_bytes.
+    """
+    def __init__(self, root: str = ARTIFACT_CACHE_DIR, max_bytes: int = ARTIFACT_CACHE_MAX_BYTES, fresh_seconds: int = ARTIFACT_CACHE_FRESH_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        # url -> [lock, holders]; an entry lives only while a fetch of that URL is running or waiting
+        self._url_locks: Dict[str, list] = {}
+        self.stats = {"hits": 0, "revalidated": 0, "downloads": 0, "evictions": 0, "errors": 0}
+
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_last_used ON artifacts(last_used)")
+        self._db.commit()
+
+    def _entry(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, sha256, path, size, etag, last_modified, fetched_at FROM artifacts WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = dict(zip(("url", "sha256", "path", "size", "etag", "last_modified", "fetched_at"), row))
+        if not os.path.exists(entry["path"]):
+            return None
+        return entry
+
+    def _touch(self, url: str, fetched: bool = False):
+        now = time.time()
+        with self._lock:
+            if fetched:
+                self._db.execute("UPDATE artifacts SET last_used = ?, fetched_at = ? WHERE url = ?", (now, now, url))
+            else:
+                self._db.execute("UPDATE artifacts SET last_used = ? WHERE url = ?", (now, url))
+            self._db.commit()
+
+    def _object_path(self, sha256: str, url: str) -> str:
+        # Keeping the extension lets pandas/pdf readers sniff the format from the path
+        ext = os.path.splitext(urlsplit(url).path)[1].lower()[:10]
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + ext)
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """
+        Returns {"url", "path", "sha256", "size", "cached"} for url, downloading or
+        revalidating only when needed. Concurrent fetches of one URL share a single download.
+        """
+        holder = self._url_locks.setdefault(url, [asyncio.Lock(), 0])
+        holder[1] += 1
+        try:
+            async with holder[0]:
+                return await self._fetch(url)
+        finally:
+            holder[1] -= 1
+            if not holder[1]:
+                del self._url_locks[url]
+
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        entry = self._entry(url)
+        if entry and time.time() - entry["fetched_at"] < self.fresh_seconds:
+            self.stats["hits"] += 1
+            self._touch(url)
+            return {**self._public(entry), "cached": True}
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        previous = entry
+        tmp_path = os.path.join(self.root, f".download_{uuid.uuid4().hex}")
+        try:
+            download = await http_client.download(url, tmp_path, headers=headers)
+            if download["status"] == 304 and entry:
+                self.stats["revalidated"] += 1
+                self._touch(url, fetched=True)
+                return {**self._public(entry), "cached": True}
+
+            sha256 = await asyncio.to_thread(_sha256_file, tmp_path)
+            path = self._object_path(sha256, url)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.stats["downloads"] += 1
+        now = time.time()
+        entry = {
+            "url": url, "sha256": sha256, "path": path, "size": download["bytes"],
+            "etag": download["headers"].get("etag"), "last_modified": download["headers"].get("last-modified")
+        }
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts (url, sha256, path, size, etag, last_modified, fetched_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, sha256, path, entry["size"], entry["etag"], entry["last_modified"], now, now)
+            )
+            self._db.commit()
+        if previous and previous["path"] != path:
+            # The URL now serves different bytes; drop the old copy unless another URL shares it
+            self._remove_unreferenced(previous["path"])
+        self._evict(keep=path)
+        return {**self._public(entry), "cached": False}
+
+    async def prepare(self, url: str) -> Dict[str, Any]:
+        """
+        fetch() plus a parsed copy of tabular files (see app.utils.tables) under "table".
+        Parsing runs in a thread and is skipped when the parsed copy already exists.
+        """
+        artifact = await self.fetch(url)
+        artifact["table"] = await asyncio.to_thread(convert_table, artifact["path"])
+        return artifact
+
+    async def prefetch(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Prepares urls concurrently and returns {url: artifact} for the ones that succeeded.
+        """
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.prepare(url) for url in urls), return_exceptions=True)
+        artifacts = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Prefetch of {url} failed: {result}")
+            else:
+                artifacts[url] = result
+        return artifacts
+
+    def start_prefetch(self, links: Iterable[Dict[str, Any]]) -> Optional[asyncio.Task]:
+        """
+        Starts prefetching a page's data links in the background, so downloads and parsing
+        overlap with the LLM round trips. Await the returned task for prefetch()'s result.
+        """
+        urls = [link["url"] for link in links if link["kind"] in PREFETCH_KINDS]
+        if not urls:
+            return None
+        return asyncio.create_task(self.prefetch(urls))
+
+    def _evict(self, keep: str):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT path, size FROM artifacts)").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._db.execute("SELECT url, path, size FROM artifacts ORDER BY last_used").fetchall()
+            for url, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._db.execute("DELETE FROM artifacts WHERE url = ?", (url,))
+                if self._remove_unreferenced(path, locked=True):
+                    total -= size
+                self.stats["evictions"] += 1
+            self._db.commit()
+
+    def _remove_unreferenced(self, path: str, locked: bool = False) -> bool:
+        # Identical content may still be referenced by another URL
+        if not locked:
+            with self._lock:
+                return self._remove_unreferenced(path, locked=True)
+        if self._db.execute("SELECT 1 FROM artifacts WHERE path = ?", (path,)).fetchone():
+            return False
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        remove_parsed(path)
+        return True
+
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: entry[key] for key in ("url", "path", "sha256", "size")}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {**self.stats, "entries": entries, "bytes": size}
+
+def prepared_tables(artifacts: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, str]:
+    """
+    url -> parsed table file, as the sandbox expects for load_table().
+    """
+    return {url: artifact["table"] for url, artifact in (artifacts or {}).items() if artifact.get("table")}
+
+def describe_artifacts(artifacts: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Prompt section telling generated code to read prefetched files from disk.
+    """
+    if not artifacts:
+        return ""
+    lines = []
+    for url, artifact in artifacts.items():
+        line = f"- {url} -> {artifact['path']}"
+        if artifact.get("table"):
+            line += f" (already parsed: df = load_table({url!r}))"
+        lines.append(line)
+    return (
+        "These files are already downloaded. Read them from the local path instead of requesting the URL:\n"
+        + "\n".join(lines) + "\n"
+    )
+
+artifact_cache = ArtifactCache()
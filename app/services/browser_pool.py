@@ -0,0 +1,158 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Set
+from urllib.parse import urlsplit
+from playwright.async_api import async_playwright
+from app.config import BROWSER_POOL_SIZE, BROWSER_CONTEXT_MAX_USES
+from app.services.request_router import request_router
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class BrowserPool:
+    """
+    Shared pool of pre-warmed Chromium contexts.
+    One browser is launched at startup and every slot keeps an open context + page,
+    so a checkout only costs navigation time instead of a Chromium launch.
+    Every context routes its requests through request_router (resource blocking, asset cache).
+    Between checkouts the slot gets a fresh page and its cookies and the storage of every
+    origin it visited are cleared, so no state leaks from one task into the next.
+    """
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_CONTEXT_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._playwright = None
+        self._browser = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self.stats = {"checkouts": 0, "recycled": 0, "unhealthy": 0}
+
+    async def start(self):
+        async with self._start_lock:
+            if self._browser:
+                return
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._idle = asyncio.Queue()
+
+            # Pre-warm all slots concurrently
+            slots = await asyncio.gather(*(self._new_slot() for _ in range(self.size)))
+            for slot in slots:
+                self._idle.put_nowait(slot)
+            logger.info(f"Browser pool ready ({self.size} contexts)")
+
+    async def stop(self):
+        if self._idle:
+            while not self._idle.empty():
+                await self._close_slot(self._idle.get_nowait())
+        if self._browser:
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+        self._idle = None
+
+    async def _new_slot(self) -> Dict[str, Any]:
+        context = await self._browser.new_context()
+        if request_router.active:
+            await context.route("**/*", request_router.handle)
+        page = await context.new_page()
+        return {"context": context, "page": page, "uses": 0, "broken": False}
+
+    async def _reset_slot(self, slot: Dict[str, Any], origins: Set[str]):
+        """
+        Wipes what the last task left behind: a new page starts with empty sessionStorage,
+        and localStorage/IndexedDB/caches are cleared per origin, since they outlive pages.
+        """
+        await slot["page"].close()
+        context = slot["context"]
+        await context.clear_cookies()
+        slot["page"] = await context.new_page()
+        if origins:
+            cdp = await context.new_cdp_session(slot["page"])
+            try:
+                for origin in origins:
+                    await cdp.send("Storage.clearDataForOrigin", {
+                        "origin": origin,
+                        "storageTypes": "local_storage,indexeddb,websql,cache_storage,service_workers,file_systems",
+                    })
+            finally:
+                await cdp.detach()
+
+    async def _close_slot(self, slot: Dict[str, Any]):
+        try:
+            if slot.get("context"):
+                await slot["context"].close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser context: {e}")
+
+    async def _is_healthy(self, slot: Dict[str, Any]) -> bool:
+        if slot["broken"] or not self._browser.is_connected() or slot["page"].is_closed():
+            return False
+        try:
+            await slot["page"].evaluate("1")
+            return True
+        except Exception:
+            return False
+
+    async def _replace_slot(self, slot: Dict[str, Any]) -> Dict[str, Any]:
+        await self._close_slot(slot)
+        if not self._browser.is_connected():
+            # Browser crashed: relaunch it, the remaining slots get replaced lazily on checkout
+            logger.warning("Browser disconnected, relaunching")
+            self._browser = await self._playwright.chromium.launch(headless=True)
+        return await self._new_slot()
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Checks a page out of the pool. The page is reset and returned on exit.
+        """
+        if not self._browser:
+            await self.start()
+
+        idle = self._idle
+        slot = await idle.get()
+        try:
+            if slot["uses"] >= self.max_uses:
+                self.stats["recycled"] += 1
+                slot = await self._replace_slot(slot)
+            elif not await self._is_healthy(slot):
+                self.stats["unhealthy"] += 1
+                slot = await self._replace_slot(slot)
+        except Exception:
+            slot["broken"] = True
+            await self._release(slot, idle)
+            raise
+
+        slot["uses"] += 1
+        self.stats["checkouts"] += 1
+        origins: Set[str] = set()
+        page = slot["page"]
+
+        def visited(frame):
+            parts = urlsplit(frame.url)
+            if parts.scheme in ("http", "https"):
+                origins.add(f"{parts.scheme}://{parts.netloc}")
+
+        page.on("framenavigated", visited)
+        try:
+            yield page
+        finally:
+            page.remove_listener("framenavigated", visited)
+            try:
+                await self._reset_slot(slot, origins)
+            except Exception:
+                slot["broken"] = True
+            finally:
+                await self._release(slot, idle)
+
+    async def _release(self, slot: Dict[str, Any], idle: asyncio.Queue):
+        # The pool was stopped (or restarted) while this slot was checked out
+        if self._idle is not idle:
+            await self._close_slot(slot)
+            return
+        idle.put_nowait(slot)
+
+browser_pool = BrowserPool()
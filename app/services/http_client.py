@@ -0,0 +1,139 @@
+import asyncio
+import random
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+import httpx
+from app.config import HTTP_MAX_CONNECTIONS, HTTP_MAX_PER_HOST, HTTP_RETRIES, HTTP_BACKOFF_SECONDS
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HTTPClient:
+    """
+    Application-scoped httpx client for submissions and downloads.
+    Connections are kept alive across calls, every host gets its own in-flight limit, and
+    idempotent requests are retried with jittered exponential backoff. POSTs are never retried.
+    """
+    def __init__(self, max_connections: int = HTTP_MAX_CONNECTIONS, max_per_host: int = HTTP_MAX_PER_HOST,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF_SECONDS,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                follow_redirects=True,
+                transport=self._transport
+            )
+            logger.info(f"HTTP client ready (http2={HTTP2_AVAILABLE}, {self.max_per_host} connections per host)")
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError("HTTP client is not started")
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(str(url)).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+        return self._hosts[host]
+
+    def _delay(self, attempt: int) -> float:
+        # Full jitter: spreads simultaneous retries against the same host
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+        """
+        Sends one request through the shared pool. Idempotent methods are retried on
+        transport errors and 429/5xx responses; the last response or error is returned/raised.
+        """
+        if self._client is None:
+            await self.start()
+        method = method.upper()
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+
+        for attempt in range(retries + 1):
+            self.stats["requests"] += 1
+            try:
+                async with self._host_limit(url):
+                    response = await self._client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                logger.warning(f"{method} {url} -> {response.status_code}, retrying ({attempt + 1}/{retries})")
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    self.stats["errors"] += 1
+                    raise
+                logger.warning(f"{method} {url} failed: {e!r}, retrying ({attempt + 1}/{retries})")
+            self.stats["retries"] += 1
+            await asyncio.sleep(self._delay(attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def download(self, url: str, path: str, chunk_size: int = 64 * 1024, **kwargs) -> Dict[str, Any]:
+        """
+        Streams a GET response straight into `path`, so memory stays flat whatever the size.
+        A dropped connection restarts the file from scratch. A 304 (conditional request via
+        headers=) writes nothing. Returns {"status", "headers", "bytes"}.
+        """
+        if self._client is None:
+            await self.start()
+        for attempt in range(self.retries + 1):
+            self.stats["requests"] += 1
+            try:
+                async with self._host_limit(url):
+                    async with self._client.stream("GET", url, **kwargs) as response:
+                        if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                            logger.warning(f"GET {url} -> {response.status_code}, retrying ({attempt + 1}/{self.retries})")
+                        elif response.status_code == 304:
+                            return {"status": 304, "headers": response.headers, "bytes": 0}
+                        else:
+                            response.raise_for_status()
+                            written = 0
+                            with open(path, "wb") as f:
+                                async for chunk in response.aiter_bytes(chunk_size):
+                                    f.write(chunk)
+                                    written += len(chunk)
+                            return {"status": response.status_code, "headers": response.headers, "bytes": written}
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    self.stats["errors"] += 1
+                    raise
+                logger.warning(f"Download of {url} failed: {e!r}, retrying ({attempt + 1}/{self.retries})")
+            self.stats["retries"] += 1
+            await asyncio.sleep(self._delay(attempt))
+
+http_client = HTTPClient()
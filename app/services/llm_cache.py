@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_PATH
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM completions.
+    Keys are SHA-256 digests of the request, so screenshot payloads are hashed once and
+    never kept around. Values live in a byte-budgeted LRU/TTL memory tier backed by SQLite.
+    Async callers use aget()/aset(), which run the SQLite tier in a worker thread so a
+    disk stall never blocks the event loop.
+    """
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES, ttl: int = LLM_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+            self._db.commit()
+            self._purge_disk()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], **params) -> str:
+        """
+        Hashes the request incrementally so large payloads are never concatenated into one key string.
+        """
+        hasher = hashlib.sha256()
+        request = {"model": model, "messages": messages, "params": params}
+        for chunk in json.JSONEncoder(sort_keys=True, separators=(",", ":")).iterencode(request):
+            hasher.update(chunk.encode("utf-8"))
+        return hasher.hexdigest()
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if not entry:
+                return None
+            value, created_at, _ = entry
+            if now - created_at <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            self._drop(key)
+            return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or now - row[1] > self.ttl:
+            return None
+        with self._lock:
+            self._store(key, row[0], row[1])
+            self.stats["disk_hits"] += 1
+        return row[0]
+
+    def _disk_put(self, key: str, value: str, created_at: float):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, created_at)
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk write failed: {e}")
+
+    def _miss(self) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db:
+            value = self._disk_get(key, now)
+        if value is None:
+            self._miss()
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        if value is None:
+            self._miss()
+        return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+        if self._db:
+            self._disk_put(key, value, now)
+
+    async def aset(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+        if self._db:
+            await asyncio.to_thread(self._disk_put, key, value, now)
+
+    def _store(self, key: str, value: str, created_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            # Too large for the memory tier, disk still has it
+            return
+        if key in self._memory:
+            self._drop(key)
+        self._memory[key] = (value, created_at, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        _, _, size = self._memory.pop(key)
+        self._bytes -= size
+
+    def _purge_disk(self):
+        with self._db_lock:
+            cur = self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        if cur.rowcount:
+            logger.info(f"Purged {cur.rowcount} expired LLM cache entries")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._memory), "bytes": self._bytes}
+
+llm_cache = LLMCache()
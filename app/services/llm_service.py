@@ -1,8 +1,16 @@
-import logging
+import asyncio
 import json
+import os
+from contextlib import nullcontext
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from app.config import AIPROXY_TOKEN, OPENAI_API_KEY, OPENAI_BASE_URL, TOKEN_BUDGET_LIMIT
+import httpx
+from openai import AsyncOpenAI, OpenAI, DefaultAsyncHttpxClient, APITimeoutError
+from app.config import (
+    AIPROXY_TOKEN, OPENAI_API_KEY, OPENAI_BASE_URL, TOKEN_BUDGET_LIMIT,
+    LLM_MAX_CONNECTIONS, LLM_DEFAULT_CONCURRENCY, LLM_MODEL_CONCURRENCY
+)
+from app.services.llm_cache import llm_cache
+from app.services.metrics import metrics
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -12,73 +20,128 @@ class LLMService:
         self.api_key = AIPROXY_TOKEN or OPENAI_API_KEY
         if not self.api_key:
             logger.warning("No API key found. LLM calls will fail.")
-        
-        self.client = OpenAI(
+
+        # One pooled HTTP client shared by every coroutine in the process
+        self.http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS
+            )
+        )
+        self.client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url=OPENAI_BASE_URL if AIPROXY_TOKEN else None
+            base_url=OPENAI_BASE_URL,
+            http_client=self.http_client
         )
-        
+        self._sync_client: Optional[OpenAI] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
         self.total_cost = 0.0
-        self._cache = {} # Simple in-memory cache
-        
+        self.cache = llm_cache
+
         # Approximate costs per 1k tokens (Input, Output)
         self.PRICING = {
             "gpt-4o-mini": (0.00015, 0.0006),
             "gpt-4o": (0.0025, 0.0100)
         }
 
+    def _limit(self, model: str) -> asyncio.Semaphore:
+        if model not in self._limits:
+            self._limits[model] = asyncio.Semaphore(LLM_MODEL_CONCURRENCY.get(model, LLM_DEFAULT_CONCURRENCY))
+        return self._limits[model]
+
+    def _span(self, model: str):
+        # Usage is attributed to the enclosing stage (analyze, codegen, ...) or to an "llm" span of its own
+        span = metrics.current()
+        if span is None:
+            return metrics.span("llm", model=model)
+        span.model = model
+        return nullcontext(span)
+
     def _track_cost(self, model: str, usage):
         if not usage:
             return
-            
+
         input_tokens = usage.prompt_tokens
         output_tokens = usage.completion_tokens
-        
+
         rates = self.PRICING.get(model, (0.0, 0.0))
         cost = (input_tokens / 1000 * rates[0]) + (output_tokens / 1000 * rates[1])
-        
+
         self.total_cost += cost
+        metrics.add(tokens_in=input_tokens, tokens_out=output_tokens, cost=cost)
         logger.info(f"Cost: ${cost:.5f} | Total: ${self.total_cost:.4f}")
-        
+
         if self.total_cost > TOKEN_BUDGET_LIMIT:
             logger.warning(f"BUDGET EXCEEDED: ${self.total_cost:.4f} > ${TOKEN_BUDGET_LIMIT}")
 
-    def call(self, messages: List[Dict[str, Any]], model: str = "gpt-4o-mini", response_format=None, use_cache: bool = True) -> str:
+    def _build_request(self, messages: List[Dict[str, Any]], model: str, response_format=None, temperature: float = 0) -> Dict[str, Any]:
+        kwargs = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature
+        }
+        if response_format:
+            kwargs["response_format"] = response_format
+        return kwargs
+
+    async def call(self, messages: List[Dict[str, Any]], model: str = "gpt-4o-mini", response_format=None, use_cache: bool = True, temperature: float = 0, timeout: Optional[float] = None) -> str:
         # Cache Key Generation
         if use_cache:
-            cache_key = f"{model}:{json.dumps(messages, sort_keys=True)}"
-            if cache_key in self._cache:
+            cache_key = self.cache.make_key(model, messages, response_format=response_format, temperature=temperature)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
                 logger.info("LLM Cache Hit")
-                return self._cache[cache_key]
+                return cached
 
         try:
             logger.info(f"Calling LLM: {model}")
-            
-            kwargs = {
-                "model": model,
-                "messages": messages,
-                "temperature": 0
-            }
-            if response_format:
-                kwargs["response_format"] = response_format
-                
-            response = self.client.chat.completions.create(**kwargs)
-            
-            self._track_cost(model, response.usage)
+
+            kwargs = self._build_request(messages, model, response_format, temperature)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            async with self._limit(model):
+                with self._span(model):
+                    response = await self.client.chat.completions.create(**kwargs)
+                    self._track_cost(model, response.usage)
             content = response.choices[0].message.content
-            
+
             if use_cache:
-                self._cache[cache_key] = content
-                
+                await self.cache.aset(cache_key, content)
+
             return content
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
-            # Fallback Strategy
-            if model == "gpt-4o":
+            # Fallback Strategy (not after a deadline-driven timeout: there is no budget left to retry)
+            if model == "gpt-4o" and not (timeout is not None and isinstance(e, APITimeoutError)):
                 logger.warning("Falling back to gpt-4o-mini")
-                return self.call(messages, model="gpt-4o-mini", response_format=response_format, use_cache=use_cache)
+                return await self.call(messages, model="gpt-4o-mini", response_format=response_format, use_cache=use_cache, temperature=temperature, timeout=timeout)
             raise
 
+    def call_sync(self, messages: List[Dict[str, Any]], model: str = "gpt-4o-mini", response_format=None) -> str:
+        """
+        Blocking variant for standalone scripts. Never use this from the server's event loop.
+        """
+        if self._sync_client is None:
+            self._sync_client = OpenAI(api_key=self.api_key, base_url=OPENAI_BASE_URL)
+        response = self._sync_client.chat.completions.create(**self._build_request(messages, model, response_format))
+        self._track_cost(model, response.usage)
+        return response.choices[0].message.content
+
+    async def transcribe(self, file_path: str, model: str = "whisper-1") -> str:
+        with open(file_path, "rb") as audio_file:
+            async with self._limit(model):
+                with self._span(model):
+                    metrics.add(bytes_out=os.path.getsize(file_path))
+                    transcript = await self.client.audio.transcriptions.create(
+                        model=model,
+                        file=audio_file
+                    )
+        return transcript.text
+
+    async def close(self):
+        await self.client.close()
+
     def parse_json(self, response: str) -> Dict[str, Any]:
         try:
             # Clean markdown
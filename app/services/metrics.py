@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+# One JSON line per finished span with its task_id/step/attempt tags; filter on the logger name
+span_logger = setup_logger("spans")
+
+# Upper bounds (seconds) of the duration histogram buckets; +Inf is implied
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Per-span quantities summed into counters
+QUANTITIES = ("tokens_in", "tokens_out", "cost", "bytes_in", "bytes_out")
+
+_tags: ContextVar[Dict[str, Any]] = ContextVar("metrics_tags", default={})
+_current: ContextVar[Optional["Span"]] = ContextVar("metrics_span", default=None)
+
+class Span:
+    """
+    One timed stage. `model` and `outcome` become metric labels; the context tags
+    (task_id, step, attempt) only go to the span log line, since they're unbounded.
+    """
+    def __init__(self, stage: str, model: str = "", tags: Optional[Dict[str, Any]] = None):
+        self.stage = stage
+        self.model = model
+        self.outcome = "ok"
+        self.tags = tags or {}
+        self.values = dict.fromkeys(QUANTITIES, 0)
+        self.duration = 0.0
+
+    def add(self, **values):
+        for key, value in values.items():
+            self.values[key] += value
+
+class Metrics:
+    """
+    Per-process stage metrics: spans are aggregated into a duration histogram plus token,
+    cost and byte counters per (stage, model, outcome) and served in the Prometheus text
+    format. Services with their own counters register a snapshot() as a collector.
+    """
+    def __init__(self, prefix: str = "quiz", buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    @contextmanager
+    def tags(self, **tags):
+        """
+        Attaches tags (task_id, step, attempt) to every span opened inside the block,
+        including in tasks it spawns.
+        """
+        token = _tags.set({**_tags.get(), **tags})
+        try:
+            yield
+        finally:
+            _tags.reset(token)
+
+    def set_tags(self, **tags):
+        """
+        Like tags(), for the rest of the current task or enclosing tags() block.
+        """
+        _tags.set({**_tags.get(), **tags})
+
+    @contextmanager
+    def span(self, stage: str, model: str = ""):
+        """
+        Times a stage and records it on exit. The outcome is "ok", "error"/"cancelled" when
+        the block raises, or whatever the block set (fetch tier, submission verdict).
+        """
+        span = Span(stage, model, dict(_tags.get()))
+        token = _current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            if span.outcome == "ok":
+                span.outcome = "cancelled" if e.__class__.__name__ == "CancelledError" else "error"
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current.reset(token)
+            self.record(span)
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def add(self, **values):
+        """
+        Adds quantities (tokens, cost, bytes) to the innermost open span, if any.
+        """
+        span = _current.get()
+        if span:
+            span.add(**values)
+
+    def record(self, span: Span):
+        key = (span.stage, span.model, span.outcome)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, **dict.fromkeys(QUANTITIES, 0)}
+            series["buckets"][bisect_left(self.buckets, span.duration)] += 1
+            series["sum"] += span.duration
+            series["count"] += 1
+            for name in QUANTITIES:
+                series[name] += span.values[name]
+        span_logger.info(json.dumps({
+            "stage": span.stage, "model": span.model, "outcome": span.outcome,
+            "duration": round(span.duration, 4), **span.tags, **{k: v for k, v in span.values.items() if v}
+        }, default=str))
+
+    def add_collector(self, name: str, snapshot: Callable[[], Dict[str, Any]]):
+        """
+        Exposes the numeric items of snapshot() as gauges named <prefix>_<name>_<key>.
+        """
+        self._collectors[name] = snapshot
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        escaped = {key: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for key, value in labels.items()}
+        return "{" + ",".join(f'{key}="{value}"' for key, value in escaped.items()) + "}"
+
+    def render(self) -> str:
+        p = self.prefix
+        with self._lock:
+            series = {key: {**value, "buckets": list(value["buckets"])} for key, value in sorted(self._series.items())}
+        lines: List[str] = [
+            f"# HELP {p}_stage_duration_seconds Wall time of each pipeline stage.",
+            f"# TYPE {p}_stage_duration_seconds histogram",
+        ]
+        for (stage, model, outcome), value in series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), value["buckets"]):
+                cumulative += count
+                lines.append(f"{p}_stage_duration_seconds_bucket{self._labels(stage=stage, model=model, outcome=outcome, le=bound)} {cumulative}")
+            labels = self._labels(stage=stage, model=model, outcome=outcome)
+            lines.append(f"{p}_stage_duration_seconds_sum{labels} {value['sum']:.6f}")
+            lines.append(f"{p}_stage_duration_seconds_count{labels} {value['count']}")
+
+        for metric, help_text, fields in (
+            ("tokens", "LLM tokens used by each stage.", (("in", "tokens_in"), ("out", "tokens_out"))),
+            ("bytes", "Bytes received/sent by each stage.", (("in", "bytes_in"), ("out", "bytes_out"))),
+        ):
+            lines += [f"# HELP {p}_stage_{metric}_total {help_text}", f"# TYPE {p}_stage_{metric}_total counter"]
+            for (stage, model, outcome), value in series.items():
+                for direction, field in fields:
+                    lines.append(f"{p}_stage_{metric}_total{self._labels(stage=stage, model=model, outcome=outcome, direction=direction)} {value[field]}")
+        lines += [f"# HELP {p}_stage_cost_usd_total Estimated LLM cost of each stage.", f"# TYPE {p}_stage_cost_usd_total counter"]
+        for (stage, model, outcome), value in series.items():
+            lines.append(f"{p}_stage_cost_usd_total{self._labels(stage=stage, model=model, outcome=outcome)} {value['cost']:.6f}")
+
+        for name, snapshot in self._collectors.items():
+            try:
+                values = snapshot()
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f"{p}_{name}_{key}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
@@ -0,0 +1,196 @@
+import hashlib
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+import tokenize
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from app.config import PROGRAM_LIBRARY_PATH, PROGRAM_LIBRARY_TTL_SECONDS
+from app.services.answer_cache import mask_user_specifics
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# The parts of a quiz that vary between instances of one template
+SLOT_RE = re.compile(r"https?://[^\s\"'<>]+|\d+(?:\.\d+)?")
+STRING_TOKENS = {tokenize.STRING} | ({tokenize.FSTRING_MIDDLE} if hasattr(tokenize, "FSTRING_MIDDLE") else set())
+
+def template(text: str, urls: Iterable[str] = ()) -> Tuple[str, List[str]]:
+    """
+    Splits a page into (signature, slots): the signature hashes the text with every number
+    and URL masked, slots are the masked values in order. Link targets (`urls`) count as
+    part of the page, since data file URLs often only appear in hrefs.
+    """
+    source = mask_user_specifics("\n".join([text, *urls]))
+    slots = SLOT_RE.findall(source)
+    skeleton = SLOT_RE.sub(lambda m: "<url>" if m.group(0).startswith("http") else "<n>", source)
+    signature = hashlib.sha256(" ".join(skeleton.lower().split()).encode("utf-8")).hexdigest()
+    return signature, slots
+
+def _offsets(code: str) -> List[int]:
+    offsets, total = [0], 0
+    for line in code.splitlines(keepends=True):
+        total += len(line)
+        offsets.append(total)
+    return offsets
+
+def _structural_numbers(tokens: List[tokenize.TokenInfo]) -> List[bool]:
+    """
+    Per token: whether it is a number in a position where code keeps its own constants
+    rather than values from the page, i.e. a call argument (axis=1, round(x, 2), .head(10))
+    or a bare index/slice bound (row[1], values[:3]).
+    """
+    significant = [i for i, tok in enumerate(tokens) if tok.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT)]
+    flags = [False] * len(tokens)
+    brackets: List[str] = []
+    for pos, i in enumerate(significant):
+        tok = tokens[i]
+        if tok.type == tokenize.OP and tok.string in "([{":
+            brackets.append(tok.string)
+        elif tok.type == tokenize.OP and tok.string in ")]}":
+            if brackets:
+                brackets.pop()
+        elif tok.type == tokenize.NUMBER and brackets:
+            before = tokens[significant[pos - 1]].string if pos else ""
+            after = tokens[significant[pos + 1]].string if pos + 1 < len(significant) else ""
+            flags[i] = brackets[-1] == "(" or (brackets[-1] == "[" and before in "[:," and after in "]:,")
+    return flags
+
+def parameterize(code: str, old_slots: List[str], new_slots: List[str], replacements: Dict[str, str] = None) -> Optional[str]:
+    """
+    Rewrites the literals of `code` that came from the old page for the new page:
+    number literals equal to an old slot become the new slot's value, and old URLs/paths
+    inside string literals are substituted. Comments and identifiers are never touched.
+    Returns None when the program can't be adapted unambiguously, including when a number
+    to rewrite appears more than once or where the code may use it as its own constant
+    (see _structural_numbers); a wrong reused answer costs a submission attempt.
+    """
+    if len(old_slots) != len(new_slots):
+        return None
+    mapping: Dict[str, Optional[str]] = {}
+    for old, new in zip(old_slots, new_slots):
+        # One old value feeding two different new ones can't be resolved from the literal alone
+        mapping[old] = new if mapping.get(old, new) == new else None
+    ambiguous = {old for old, new in mapping.items() if new is None}
+    numbers = {old: new for old, new in mapping.items() if new is not None and old != new and not old.startswith("http")}
+    strings = {old: new for old, new in mapping.items() if new is not None and old != new and old.startswith("http")}
+    strings.update(replacements or {})
+    ordered = sorted(strings, key=len, reverse=True)
+
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (tokenize.TokenError, SyntaxError):
+        return None
+    occurrences: Dict[str, int] = {}
+    for tok in tokens:
+        if tok.type == tokenize.NUMBER:
+            occurrences[tok.string] = occurrences.get(tok.string, 0) + 1
+    if any(occurrences.get(old, 0) > 1 for old in numbers):
+        return None
+    structural = _structural_numbers(tokens)
+
+    offsets = _offsets(code)
+    edits = []
+    for i, tok in enumerate(tokens):
+        if tok.type == tokenize.NUMBER and tok.string in ambiguous:
+            return None
+        if tok.type == tokenize.NUMBER and tok.string in numbers and structural[i]:
+            return None
+        if tok.type in STRING_TOKENS and any(old in tok.string for old in ambiguous if old.startswith("http")):
+            return None
+        if tok.type == tokenize.NUMBER and tok.string in numbers:
+            replacement = numbers[tok.string]
+        elif tok.type in STRING_TOKENS and any(old in tok.string for old in ordered):
+            replacement = tok.string
+            for old in ordered:
+                replacement = replacement.replace(old, strings[old])
+        else:
+            continue
+        start = offsets[tok.start[0] - 1] + tok.start[1]
+        end = offsets[tok.end[0] - 1] + tok.end[1]
+        edits.append((start, end, replacement))
+    for start, end, replacement in reversed(edits):
+        code = code[:start] + replacement + code[end:]
+    return code
+
+class ProgramLibrary:
+    """
+    Programs that solved a quiz correctly, keyed on the quiz's template (see template()).
+    A new quiz from the same template re-runs the stored program with its literals swapped
+    for the new numbers, URLs and local file paths instead of asking the coding LLM.
+    """
+    def __init__(self, path: str = PROGRAM_LIBRARY_PATH, ttl: int = PROGRAM_LIBRARY_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {"reused": 0, "misses": 0, "stored": 0, "forgotten": 0}
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS programs ("
+            "signature TEXT PRIMARY KEY, slots TEXT NOT NULL, paths TEXT NOT NULL, code TEXT NOT NULL, "
+            "created_at REAL NOT NULL, uses INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.commit()
+
+    def get(self, signature: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT slots, paths, code FROM programs WHERE signature = ? AND created_at >= ?",
+                (signature, time.time() - self.ttl)
+            ).fetchone()
+        if not row:
+            self.stats["misses"] += 1
+            return None
+        return {"slots": json.loads(row[0]), "paths": json.loads(row[1]), "code": row[2]}
+
+    def adapt(self, entry: Dict[str, Any], slots: List[str], artifacts: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """
+        The stored program rewritten for a quiz with `slots` and prefetched `artifacts`.
+        Local paths of the old data files are mapped to the new files through their URLs.
+        """
+        mapping = dict(zip(entry["slots"], slots))
+        replacements = {}
+        for old_url, old_path in entry["paths"].items():
+            if old_path not in entry["code"]:
+                continue
+            artifact = artifacts.get(mapping.get(old_url, old_url))
+            if not artifact:
+                return None
+            replacements[old_path] = artifact["path"]
+        return parameterize(entry["code"], entry["slots"], slots, replacements)
+
+    def record_use(self, signature: str):
+        self.stats["reused"] += 1
+        with self._lock:
+            self._db.execute("UPDATE programs SET uses = uses + 1 WHERE signature = ?", (signature,))
+            self._db.commit()
+
+    def store(self, signature: str, slots: List[str], code: str, artifacts: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Call only after the server confirmed the program's answer as correct.
+        """
+        paths = {url: artifact["path"] for url, artifact in (artifacts or {}).items()}
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO programs (signature, slots, paths, code, created_at) VALUES (?, ?, ?, ?, ?)",
+                (signature, json.dumps(slots), json.dumps(paths), code, time.time())
+            )
+            self._db.commit()
+        self.stats["stored"] += 1
+
+    def forget(self, signature: str):
+        with self._lock:
+            cur = self._db.execute("DELETE FROM programs WHERE signature = ?", (signature,))
+            self._db.commit()
+        if cur.rowcount:
+            self.stats["forgotten"] += 1
+            logger.info("Dropped library program after an incorrect reused answer")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM programs").fetchone()[0]
+        return {**self.stats, "entries": entries}
+
+program_library = ProgramLibrary()
@@ -0,0 +1,118 @@
+import contextlib
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+from app.config import (
+    BROWSER_BLOCK_RESOURCE_TYPES, BROWSER_BLOCK_DOMAINS, BROWSER_ASSET_CACHE_TYPES,
+    BROWSER_ASSET_CACHE_MAX_BYTES, BROWSER_ASSET_CACHE_TTL_SECONDS
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class RequestRouter:
+    """
+    Route handler installed on every pooled browser context.
+    Requests for blocked resource types (fonts, media) and tracker domains are aborted, and
+    static assets are served from a shared in-memory LRU/TTL cache after the first fetch,
+    so consecutive quiz pages don't download the same stylesheets and images again.
+    """
+    def __init__(self, block_types: Iterable[str] = BROWSER_BLOCK_RESOURCE_TYPES,
+                 block_domains: Iterable[str] = BROWSER_BLOCK_DOMAINS,
+                 cache_types: Iterable[str] = BROWSER_ASSET_CACHE_TYPES,
+                 max_bytes: int = BROWSER_ASSET_CACHE_MAX_BYTES, ttl: int = BROWSER_ASSET_CACHE_TTL_SECONDS):
+        self.block_types = set(block_types)
+        self.block_domains = tuple(block_domains)
+        self.cache_types = set(cache_types)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._assets: "OrderedDict[str, Tuple[float, int, Dict[str, str], bytes]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"blocked": 0, "asset_hits": 0, "asset_stores": 0, "passed": 0}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.block_types or self.block_domains or self.cache_types)
+
+    def blocked(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.block_types:
+            return True
+        host = urlsplit(url).hostname or ""
+        return any(host == domain or host.endswith("." + domain) for domain in self.block_domains)
+
+    def cacheable(self, request) -> bool:
+        if request.method != "GET" or request.resource_type not in self.cache_types:
+            return False
+        if request.resource_type == "script":
+            # Same-origin scripts may build the quiz itself; only shared third-party ones are cached
+            try:
+                page_host = urlsplit(request.frame.url).netloc
+            except Exception:
+                return False
+            return urlsplit(request.url).netloc != page_host
+        return True
+
+    def _get(self, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        entry = self._assets.get(url)
+        if not entry:
+            return None
+        stored_at, status, headers, body = entry
+        if time.time() - stored_at > self.ttl:
+            self._drop(url)
+            return None
+        self._assets.move_to_end(url)
+        return status, headers, body
+
+    def _store(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        if len(body) > self.max_bytes // 4:
+            return
+        self._drop(url)
+        headers = {key: value for key, value in headers.items() if key.lower() != "set-cookie"}
+        self._assets[url] = (time.time(), status, headers, body)
+        self._bytes += len(body)
+        self.stats["asset_stores"] += 1
+        while self._bytes > self.max_bytes and self._assets:
+            self._drop(next(iter(self._assets)))
+
+    def _drop(self, url: str):
+        entry = self._assets.pop(url, None)
+        if entry:
+            self._bytes -= len(entry[3])
+
+    @staticmethod
+    def _storable(headers: Dict[str, str]) -> bool:
+        cache_control = headers.get("cache-control", "").lower()
+        return not any(word in cache_control for word in ("no-store", "no-cache", "private"))
+
+    async def handle(self, route, request):
+        try:
+            if self.blocked(request.url, request.resource_type):
+                self.stats["blocked"] += 1
+                await route.abort("blockedbyclient")
+                return
+            if not self.cacheable(request):
+                self.stats["passed"] += 1
+                await route.continue_()
+                return
+            cached = self._get(request.url)
+            if cached:
+                self.stats["asset_hits"] += 1
+                status, headers, body = cached
+                await route.fulfill(status=status, headers=headers, body=body)
+                return
+            response = await route.fetch()
+            body = await response.body()
+            if response.status == 200 and self._storable(response.headers):
+                self._store(request.url, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
+        except Exception as e:
+            # Usually the page navigated or closed mid-request; make sure the request isn't left hanging
+            logger.debug(f"Routing {request.url} failed: {e}")
+            with contextlib.suppress(Exception):
+                await route.abort("failed")
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "assets": len(self._assets), "asset_bytes": self._bytes}
+
+request_router = RequestRouter()
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+import signal
+import struct
+import sys
+from typing import Dict, Any, Optional
+from app.config import (
+    BASE_DIR, SANDBOX_POOL_SIZE, SANDBOX_MAX_JOBS_PER_WORKER, SANDBOX_MEMORY_LIMIT_MB, SANDBOX_MAX_OUTPUT_CHARS
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+class SandboxPool:
+    """
+    Pool of pre-started Python workers with pandas/numpy/sklearn already imported.
+    Generated scripts are sent over a pipe and run in a child forked from a worker, so a run
+    skips interpreter startup and the cold data-stack import, never touches disk, and leaves
+    no global state behind for the next job.
+    """
+    def __init__(self, size: int = SANDBOX_POOL_SIZE, max_jobs: int = SANDBOX_MAX_JOBS_PER_WORKER, memory_mb: int = SANDBOX_MEMORY_LIMIT_MB,
+                 max_output: int = SANDBOX_MAX_OUTPUT_CHARS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.memory_mb = memory_mb
+        self.max_output = max_output
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self._background = set()
+        self.stats = {"jobs": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+
+    async def start(self):
+        async with self._start_lock:
+            if self._idle:
+                return
+            self._idle = asyncio.Queue()
+            workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+            for worker in workers:
+                self._idle.put_nowait(worker)
+            logger.info(f"Sandbox pool ready ({self.size} workers)")
+
+    async def stop(self):
+        if not self._idle:
+            return
+        idle, self._idle = self._idle, None
+        while not idle.empty():
+            await self._terminate(idle.get_nowait())
+        # Replacements still spawning see the pool stopped and terminate their worker
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _spawn(self) -> Dict[str, Any]:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "app.services.sandbox_worker", str(self.memory_mb),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            cwd=PROJECT_ROOT,
+            # Own process group, so killing a worker also kills the job child it forked
+            start_new_session=True
+        )
+        worker = {"proc": proc, "jobs": 0}
+        # Wait until the data stack is imported
+        await asyncio.wait_for(self._read_frame(worker), timeout=120)
+        return worker
+
+    async def _terminate(self, worker: Dict[str, Any]):
+        proc = worker["proc"]
+        if proc.returncode is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                proc.kill()
+            await proc.wait()
+
+    async def _release(self, worker: Dict[str, Any], idle: asyncio.Queue):
+        # The pool was stopped (or restarted) while this worker was busy or spawning
+        if self._idle is not idle:
+            await self._terminate(worker)
+            return
+        idle.put_nowait(worker)
+
+    async def _replace(self, worker: Dict[str, Any], idle: asyncio.Queue):
+        await self._terminate(worker)
+        try:
+            worker = await self._spawn()
+        except Exception as e:
+            logger.error(f"Failed to respawn sandbox worker: {e}")
+            # Keep the slot so the pool doesn't shrink; it is respawned on next checkout
+            worker["jobs"] = self.max_jobs
+        await self._release(worker, idle)
+
+    def _replace_later(self, worker: Dict[str, Any], idle: asyncio.Queue):
+        task = asyncio.create_task(self._replace(worker, idle))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _read_frame(self, worker: Dict[str, Any]) -> Dict[str, Any]:
+        stream = worker["proc"].stdout
+        (size,) = struct.unpack(">I", await stream.readexactly(4))
+        return json.loads((await stream.readexactly(size)).decode("utf-8"))
+
+    async def _write_frame(self, worker: Dict[str, Any], payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        worker["proc"].stdin.write(struct.pack(">I", len(body)) + body)
+        await worker["proc"].stdin.drain()
+
+    async def run(self, code: str, timeout: float = 60, tables: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Runs a script in a warm worker. stdout/stderr keep only their last max_output characters.
+        `tables` maps URLs to prepared table files that the script opens with load_table(url).
+        Returns: {"stdout": ..., "stderr": ..., "returncode": ..., "timed_out": ...}
+        """
+        if not self._idle:
+            await self.start()
+
+        idle = self._idle
+        worker = await idle.get()
+        if worker["proc"].returncode is not None or worker["jobs"] >= self.max_jobs:
+            await self._terminate(worker)
+            try:
+                worker = await self._spawn()
+            except Exception:
+                await self._release(worker, idle)
+                raise
+
+        self.stats["jobs"] += 1
+        try:
+            await self._write_frame(worker, {"code": code, "max_output": self.max_output, "tables": tables or {}})
+            result = await asyncio.wait_for(self._read_frame(worker), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self._replace_later(worker, idle)
+            return {"stdout": "", "stderr": f"Execution timed out after {timeout}s", "returncode": -1, "timed_out": True}
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            # Worker died mid-job, most likely the memory limit
+            self.stats["crashes"] += 1
+            self._replace_later(worker, idle)
+            return {"stdout": "", "stderr": f"Sandbox worker crashed: {e}", "returncode": -1, "timed_out": False}
+        except BaseException:
+            self._replace_later(worker, idle)
+            raise
+
+        worker["jobs"] += 1
+        if worker["jobs"] >= self.max_jobs:
+            # Recycle in the background so the caller doesn't wait for a respawn
+            self.stats["recycled"] += 1
+            self._replace_later(worker, idle)
+        else:
+            await self._release(worker, idle)
+
+        result["timed_out"] = False
+        return result
+
+sandbox_pool = SandboxPool()
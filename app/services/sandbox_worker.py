@@ -0,0 +1,217 @@
+"""
+Long-lived sandbox worker, started by SandboxPool as `python -m app.services.sandbox_worker`.
+It imports the data stack once, then forks a child per job received on stdin: the child
+starts with the warm imports but any state a script changes (pandas options, os.environ,
+random seeds, monkeypatched modules, threads) dies with it. The captured stdout/stderr
+go back as a length-prefixed JSON frame. Jobs may name prepared tables, which scripts open
+with load_table(url).
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import struct
+import sys
+import traceback
+from collections import OrderedDict
+
+PRELOAD_MODULES = ("pandas", "numpy", "sklearn", "requests", "bs4", "pyarrow")
+# Bound before any job runs, so a script replacing json.dumps can't break the result frame
+_encode = json.JSONEncoder().encode
+
+def read_frame(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    (size,) = struct.unpack(">I", header)
+    return json.loads(stream.read(size).decode("utf-8"))
+
+def write_frame(stream, payload: dict):
+    body = json.dumps(payload).encode("utf-8")
+    stream.write(struct.pack(">I", len(body)) + body)
+    stream.flush()
+
+def _set_memory_limit(limit_mb: int):
+    if limit_mb <= 0:
+        return
+    try:
+        import resource
+        limit = limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+class TailBuffer(io.TextIOBase):
+    """
+    Text sink that keeps only the last `limit` characters written to it.
+    Answers are printed last, so the tail is the part worth keeping.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.dropped = 0
+        self._chunks = []
+        self._size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._chunks.append(text)
+        self._size += len(text)
+        if self.limit and self._size > 2 * self.limit:
+            self._compact()
+        return len(text)
+
+    def _compact(self):
+        value = "".join(self._chunks)
+        if self.limit and len(value) > self.limit:
+            self.dropped += len(value) - self.limit
+            value = value[-self.limit:]
+        self._chunks = [value]
+        self._size = len(value)
+
+    def getvalue(self) -> str:
+        self._compact()
+        if self.dropped:
+            return f"[... {self.dropped} characters truncated ...]\n" + self._chunks[0]
+        return self._chunks[0]
+
+class TableRegistry:
+    """
+    Opens prepared tables (see app.utils.tables) and keeps them open across jobs, so every
+    attempt of a task reuses one parse. Paths are content-addressed, so a cached entry
+    can never go stale. Arrow files stay memory-mapped; scripts get a fresh DataFrame
+    each call, so in-place edits never leak into the next attempt.
+    """
+    def __init__(self, max_open: int = 8):
+        self.max_open = max_open
+        self._open = OrderedDict()
+
+    def _get(self, path: str):
+        if path in self._open:
+            self._open.move_to_end(path)
+            return self._open[path]
+        from app.utils.tables import open_parsed
+        table = open_parsed(path)
+        self._open[path] = table
+        while len(self._open) > self.max_open:
+            self._open.popitem(last=False)
+        return table
+
+    def loader(self, tables: dict):
+        def load_table(name: str):
+            path = tables.get(name)
+            if path is None:
+                # Also accept a file name such as "data.csv"
+                matches = [p for url, p in tables.items() if url.split("?")[0].endswith("/" + name)]
+                path = matches[0] if matches else None
+            if path is None:
+                raise KeyError(f"No prepared table {name!r}; available: {list(tables)}")
+            table = self._get(path)
+            return table.to_pandas() if hasattr(table, "to_pandas") else table.copy()
+        return load_table
+
+_tables = TableRegistry()
+
+def run_script(code: str, max_output: int = 0, tables: dict = None) -> dict:
+    stdout, stderr = TailBuffer(max_output), TailBuffer(max_output)
+    returncode = 0
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__, "load_table": _tables.loader(tables or {})}
+    cwd = os.getcwd()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            exec(compile(code, "<solution>", "exec"), namespace)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                returncode = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            os.chdir(cwd)
+
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "returncode": returncode}
+
+def _read_all(fd: int) -> bytes:
+    chunks = []
+    while True:
+        chunk = os.read(fd, 1024 * 1024)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+def run_forked(job: dict) -> dict:
+    """
+    Runs one job in a forked child and returns its result. Without fork (Windows) the job
+    runs in-process, without isolation.
+    """
+    tables = job.get("tables") or {}
+    if not hasattr(os, "fork"):
+        return run_script(job["code"], job.get("max_output", 0), tables)
+
+    # Opened in the parent so every child (every attempt of a task) shares one parse
+    for path in tables.values():
+        try:
+            _tables._get(path)
+        except Exception:
+            pass  # the script's load_table() call reports it
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            result = run_script(job["code"], job.get("max_output", 0), tables)
+            with os.fdopen(write_fd, "wb") as out:
+                out.write(_encode(result).encode("utf-8"))
+            status = 0
+        finally:
+            # Skip interpreter teardown (atexit hooks, leftover threads) in the child
+            os._exit(status)
+
+    os.close(write_fd)
+    try:
+        body = _read_all(read_fd)
+    finally:
+        os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    try:
+        return json.loads(body.decode("utf-8"))
+    except ValueError:
+        # Killed mid-job, most likely by the memory limit
+        return {"stdout": "", "stderr": f"Sandbox job died (wait status {status})", "returncode": -1}
+
+def main():
+    limit_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+
+    # The protocol runs over private copies of the pipes. fds 0/1 point at /dev/null so
+    # stray C-level writes from a script can never corrupt a frame.
+    proto_in = os.fdopen(os.dup(0), "rb")
+    proto_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    # The cap has to hold while the data stack is imported too
+    _set_memory_limit(limit_mb)
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except (ImportError, MemoryError):
+            pass
+
+    write_frame(proto_out, {"ready": True})
+    while True:
+        job = read_frame(proto_in)
+        if job is None:
+            break
+        write_frame(proto_out, run_forked(job))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+from app.config import SCHEDULER_WORKERS, SCHEDULER_MAX_QUEUE, SCHEDULER_MAX_PER_EMAIL
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class QueueFullError(Exception):
+    pass
+
+class TaskScheduler:
+    """
+    Bounded job queue drained by a fixed number of workers.
+    Every email gets its own FIFO lane and lanes are served round-robin: a free worker takes
+    the head of the lane that has started the fewest jobs, so one user flooding the queue
+    can't starve the others. Within a round the earliest deadline goes first.
+    """
+    def __init__(self, workers: int = SCHEDULER_WORKERS, max_queue: int = SCHEDULER_MAX_QUEUE, max_per_email: int = SCHEDULER_MAX_PER_EMAIL):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_per_email = max_per_email
+        self._lanes: Dict[str, deque] = {}
+        # Jobs started per lane; a new lane joins at the current round so it can't bank credit
+        self._served: Dict[str, int] = {}
+        self._round = 0
+        self._depth = 0
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._workers = []
+        self._busy = 0
+        self._waits = deque(maxlen=100)
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    async def start(self):
+        if self._workers:
+            return
+        self._ready = asyncio.Semaphore(0)
+        self._workers = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+        logger.info(f"Scheduler started ({self.workers} workers, queue limit {self.max_queue})")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def check_capacity(self, key: str):
+        if self._depth >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"Queue is full ({self._depth} jobs waiting)")
+        if len(self._lanes.get(key, ())) >= self.max_per_email:
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"Too many queued jobs for {key}")
+
+    def submit(self, key: str, job: Callable[[], Awaitable[Any]], deadline: float) -> int:
+        """
+        Queues job for the lane `key`. deadline is a time.monotonic() timestamp.
+        Returns the overall queue depth after insertion. Raises QueueFullError on backpressure.
+        """
+        self.check_capacity(key)
+        if not self._workers:
+            raise RuntimeError("Scheduler is not started")
+        if key not in self._lanes:
+            self._lanes[key] = deque()
+            self._served[key] = self._round
+        self._lanes[key].append({
+            "job": job,
+            "deadline": deadline,
+            "enqueued_at": time.monotonic()
+        })
+        self._depth += 1
+        self.stats["submitted"] += 1
+        self._ready.release()
+        return self._depth
+
+    def _pick(self) -> Dict[str, Any]:
+        key = min(
+            self._lanes,
+            key=lambda k: (self._served[k], self._lanes[k][0]["deadline"], self._lanes[k][0]["enqueued_at"])
+        )
+        entry = self._lanes[key].popleft()
+        self._round = self._served[key]
+        self._served[key] += 1
+        if not self._lanes[key]:
+            del self._lanes[key]
+            del self._served[key]
+        self._depth -= 1
+        return entry
+
+    async def _work(self, worker_id: int):
+        while True:
+            await self._ready.acquire()
+            entry = self._pick()
+            wait = time.monotonic() - entry["enqueued_at"]
+            self._waits.append(wait)
+            self._busy += 1
+            try:
+                await entry["job"]()
+                self.stats["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Scheduled job failed on worker {worker_id}: {e}")
+            finally:
+                self._busy -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        oldest = min((lane[0]["enqueued_at"] for lane in self._lanes.values()), default=now)
+        waits = list(self._waits)
+        return {
+            **self.stats,
+            "depth": self._depth,
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            "busy": self._busy,
+            "lanes": len(self._lanes),
+            "oldest_wait_seconds": round(now - oldest, 3),
+            "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "max_wait_seconds": round(max(waits), 3) if waits else 0.0
+        }
+
+task_scheduler = TaskScheduler()
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Dict
+
+class TaskEvents:
+    """
+    Wakes up stream subscribers when a task gets a new log line or status.
+    Subscribers grab the event *before* reading task state, so no change is missed
+    between the read and the wait.
+    """
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._subscribers: Dict[str, int] = {}
+
+    def subscribe(self, task_id: str) -> asyncio.Event:
+        """
+        Pair every call with unsubscribe(), so finished tasks don't keep an entry.
+        """
+        self._subscribers[task_id] = self._subscribers.get(task_id, 0) + 1
+        if task_id not in self._events:
+            self._events[task_id] = asyncio.Event()
+        return self._events[task_id]
+
+    def unsubscribe(self, task_id: str):
+        count = self._subscribers.get(task_id, 0) - 1
+        if count > 0:
+            self._subscribers[task_id] = count
+            return
+        self._subscribers.pop(task_id, None)
+        self._events.pop(task_id, None)
+
+    def notify(self, task_id: str):
+        event = self._events.pop(task_id, None)
+        if event:
+            event.set()
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+task_events = TaskEvents()
@@ -1,24 +1,85 @@
 # app/services/task_fetcher.py
-from playwright.async_api import async_playwright
+import time
+from typing import Dict, Any, Optional
+from app.services.browser_pool import browser_pool
+from app.services.http_client import http_client
+from app.services.request_router import request_router
+from app.utils.page_extract import extract_page, script_status, visual_element_count
+from app.utils.page_observe import wait_ready
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Cheapest first: plain GET, GET + decoded atob() payloads, full Chromium render
+TIERS = ("http", "decoded", "browser")
+# The static probe is a single short GET; anything slow escalates to the browser instead
+STATIC_PROBE_TIMEOUT = 5
+
 class TaskFetcher:
-    async def fetch(self, url: str) -> str:
+    """
+    Fetches quiz pages through the cheapest tier that yields the full content.
+    Static pages and pages that only atob() a payload into the DOM are parsed from a plain
+    HTTP response; anything running other scripts escalates to a pooled browser page.
+    """
+    def __init__(self):
+        self.stats = {tier: 0 for tier in TIERS}
+
+    def record(self, tier: str):
+        self.stats[tier] += 1
+
+    def hit_rates(self) -> Dict[str, float]:
+        total = sum(self.stats.values())
+        return {tier: round(count / total, 3) if total else 0.0 for tier, count in self.stats.items()}
+
+    async def fetch_static(self, url: str, timeout: float = 30) -> Optional[Dict[str, Any]]:
+        """
+        The page's extraction (see app.utils.page_extract) from a plain GET, with "html",
+        "tier" and "visual_elements", or None when only a browser can render it.
+        Doesn't count towards the tier stats; callers record() the tier they end up using.
+        No retries: a failed probe costs at most STATIC_PROBE_TIMEOUT before the browser tries.
+        """
+        try:
+            response = await http_client.get(url, timeout=min(STATIC_PROBE_TIMEOUT, timeout), retries=0)
+        except Exception as e:
+            logger.info(f"Static fetch of {url} failed ({e!r}), escalating to the browser")
+            return None
+        if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+            return None
+        html = response.text
+        # Tracker scripts are blocked in the browser too, so they don't force a render
+        scripts = script_status(html, ignore_src=lambda src: request_router.blocked(src, "script"))
+        if scripts == "dynamic":
+            return None
+        page_data = extract_page(html, str(response.url))
+        page_data.update({
+            "html": html,
+            "tier": "decoded" if scripts == "resolvable" else "http",
+            "visual_elements": visual_element_count(html),
+        })
+        return page_data
+
+    async def fetch(self, url: str, timeout: float = 30) -> Dict[str, Any]:
+        """
+        Returns the page's structured extraction (see app.utils.page_extract) plus the raw
+        "html" and the "tier" that produced it. `timeout` covers both tiers.
+        """
+        started = time.monotonic()
+        page_data = await self.fetch_static(url, timeout)
+        if page_data:
+            self.record(page_data["tier"])
+            logger.info(f"Fetched {url} without a browser ({page_data['tier']})")
+            return page_data
+
         logger.info(f"Fetching URL (Playwright): {url}")
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            try:
-                await page.goto(url)
-                await page.wait_for_load_state("networkidle")
-                # Return the visible text, or full content if text is empty
-                text = await page.inner_text("body")
-                if not text.strip():
-                     text = await page.content()
-                return text
-            finally:
-                await browser.close()
+        self.record("browser")
+        timeout = max(1, timeout - (time.monotonic() - started))
+        async with browser_pool.page() as page:
+            await page.goto(url, timeout=timeout * 1000, wait_until="domcontentloaded")
+            await wait_ready(page, min(5, timeout) * 1000)
+            html = await page.content()
+            page_data = extract_page(html, page.url)
+            page_data["html"] = html
+            page_data["tier"] = "browser"
+            return page_data
 
 task_fetcher = TaskFetcher()
@@ -0,0 +1,375 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import (
+    TASK_STORE_BACKEND, TASK_STORE_PATH, TASK_RETENTION_SECONDS, TASK_STALE_SECONDS, TASK_MAX_LOGS,
+    TASK_LOG_BATCH_SIZE, TASK_LOG_FLUSH_INTERVAL
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed", "error", "timeout")
+TASK_FIELDS = ("status", "current_url", "result", "error")
+ABANDONED_ERROR = "Abandoned: the worker running this task stopped before it finished"
+
+class TaskStore(ABC):
+    """
+    Storage for task state, logs and history.
+    Log offsets are absolute, so stream readers can resume even after old lines are dropped.
+    """
+    retention_seconds = TASK_RETENTION_SECONDS
+    stale_seconds = TASK_STALE_SECONDS
+
+    @abstractmethod
+    def create_task(self, email: str, initial_url: str) -> str:
+        pass
+
+    @abstractmethod
+    def get_task(self, task_id: str, include_logs: bool = True) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def update(self, task_id: str, **fields):
+        pass
+
+    @abstractmethod
+    def log(self, task_id: str, message: str):
+        pass
+
+    @abstractmethod
+    def get_logs(self, task_id: str, offset: int = 0) -> List[str]:
+        pass
+
+    @abstractmethod
+    def add_history(self, task_id: str, url: str, action: str, result: str):
+        pass
+
+    @abstractmethod
+    def list_tasks(self, offset: int = 0, limit: int = 50, status: Optional[str] = None, email: Optional[str] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Returns (total, summaries) newest first. Summaries carry log_count instead of logs.
+        """
+        pass
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """
+        Marks unfinished tasks idle for stale_seconds as failed (their worker crashed, restarted
+        or stopped), then deletes finished tasks older than retention_seconds.
+        """
+        pass
+
+    def flush(self):
+        pass
+
+    async def start(self, evict_every: float = 300):
+        """
+        Starts the background loop that flushes batched logs and evicts expired tasks.
+        """
+        if getattr(self, "_maintenance", None):
+            return
+        self._maintenance = asyncio.create_task(self._maintain(evict_every))
+
+    async def stop(self):
+        task = getattr(self, "_maintenance", None)
+        if task:
+            task.cancel()
+            self._maintenance = None
+        self.flush()
+
+    async def _maintain(self, evict_every: float):
+        last_evict = 0.0
+        while True:
+            await asyncio.sleep(TASK_LOG_FLUSH_INTERVAL)
+            try:
+                self.flush()
+                if time.time() - last_evict >= evict_every:
+                    last_evict = time.time()
+                    evicted = self.evict_expired()
+                    if evicted:
+                        logger.info(f"Evicted {evicted} expired tasks")
+            except Exception as e:
+                logger.error(f"Task store maintenance failed: {e}")
+
+class MemoryTaskStore(TaskStore):
+    """
+    Process-local store. Logs per task are capped at max_logs (oldest lines dropped).
+    """
+    def __init__(self, max_logs: int = TASK_MAX_LOGS):
+        self.max_logs = max_logs
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+
+    def create_task(self, email: str, initial_url: str) -> str:
+        task_id = str(uuid.uuid4())
+        self._tasks[task_id] = {
+            "id": task_id,
+            "email": email,
+            "current_url": initial_url,
+            "status": "queued",
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": time.time(),
+            "result": None,
+            "error": None,
+            "logs": deque(maxlen=self.max_logs),
+            "log_count": 0,
+            "history": []
+        }
+        return task_id
+
+    def get_task(self, task_id: str, include_logs: bool = True) -> Optional[Dict[str, Any]]:
+        task = self._tasks.get(task_id)
+        if not task:
+            return None
+        snapshot = {k: v for k, v in task.items() if k not in ("logs", "history", "updated_at")}
+        if include_logs:
+            snapshot["logs"] = list(task["logs"])
+            snapshot["history"] = list(task["history"])
+        return snapshot
+
+    def update(self, task_id: str, **fields):
+        task = self._tasks.get(task_id)
+        if task:
+            task.update({k: v for k, v in fields.items() if k in TASK_FIELDS})
+            task["updated_at"] = time.time()
+
+    def log(self, task_id: str, message: str):
+        task = self._tasks.get(task_id)
+        if task:
+            task["logs"].append(message)
+            task["log_count"] += 1
+            task["updated_at"] = time.time()
+
+    def get_logs(self, task_id: str, offset: int = 0) -> List[str]:
+        task = self._tasks.get(task_id)
+        if not task:
+            return []
+        dropped = task["log_count"] - len(task["logs"])
+        return list(task["logs"])[max(0, offset - dropped):]
+
+    def add_history(self, task_id: str, url: str, action: str, result: str):
+        task = self._tasks.get(task_id)
+        if task:
+            task["history"].append({
+                "url": url,
+                "action": action,
+                "result": result,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+
+    def list_tasks(self, offset: int = 0, limit: int = 50, status: Optional[str] = None, email: Optional[str] = None):
+        matches = [
+            self.get_task(task_id, include_logs=False)
+            for task_id, task in reversed(list(self._tasks.items()))
+            if (not status or task["status"] == status) and (not email or task["email"] == email)
+        ]
+        return len(matches), matches[offset:offset + limit]
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        for task in self._tasks.values():
+            if task["status"] not in TERMINAL_STATUSES and task["updated_at"] < now - self.stale_seconds:
+                task.update(status="failed", error=ABANDONED_ERROR, updated_at=now)
+        cutoff = now - self.retention_seconds
+        expired = [
+            task_id for task_id, task in self._tasks.items()
+            if task["status"] in TERMINAL_STATUSES and task["updated_at"] < cutoff
+        ]
+        for task_id in expired:
+            del self._tasks[task_id]
+        return len(expired)
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Durable store shared by every worker process on the host.
+    Log lines go to an append-only table and are written in batches.
+    """
+    def __init__(self, path: str = TASK_STORE_PATH, batch_size: int = TASK_LOG_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, str]] = []
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                email TEXT,
+                current_url TEXT,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+            CREATE INDEX IF NOT EXISTS idx_tasks_email ON tasks(email);
+            CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+            CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks(updated_at);
+
+            CREATE TABLE IF NOT EXISTS task_logs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_task_logs_task ON task_logs(task_id, seq);
+
+            CREATE TABLE IF NOT EXISTS task_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                url TEXT,
+                action TEXT,
+                result TEXT,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_task_history_task ON task_history(task_id);
+        """)
+        self._db.commit()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            self._flush_locked()
+            cur = self._db.execute(sql, params)
+            self._db.commit()
+            return cur
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            self._flush_locked()
+            return self._db.execute(sql, params).fetchall()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._db.executemany("INSERT INTO task_logs (task_id, ts, message) VALUES (?, ?, ?)", self._pending)
+        self._db.commit()
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def create_task(self, email: str, initial_url: str) -> str:
+        task_id = str(uuid.uuid4())
+        self._execute(
+            "INSERT INTO tasks (id, email, current_url, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (task_id, email, initial_url, "queued", datetime.utcnow().isoformat(), time.time())
+        )
+        return task_id
+
+    def _row_to_task(self, row: sqlite3.Row, log_count: int) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "email": row["email"],
+            "current_url": row["current_url"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "result": row["result"],
+            "error": row["error"],
+            "log_count": log_count
+        }
+
+    def get_task(self, task_id: str, include_logs: bool = True) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT t.*, (SELECT COUNT(*) FROM task_logs l WHERE l.task_id = t.id) AS log_count "
+            "FROM tasks t WHERE t.id = ?", (task_id,)
+        )
+        if not rows:
+            return None
+        task = self._row_to_task(rows[0], rows[0]["log_count"])
+        if include_logs:
+            task["logs"] = self.get_logs(task_id)
+            task["history"] = [
+                dict(r) for r in self._query(
+                    "SELECT url, action, result, timestamp FROM task_history WHERE task_id = ? ORDER BY id", (task_id,)
+                )
+            ]
+        return task
+
+    def update(self, task_id: str, **fields):
+        fields = {k: v for k, v in fields.items() if k in TASK_FIELDS}
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        self._execute(
+            f"UPDATE tasks SET {assignments}, updated_at = ? WHERE id = ?",
+            (*fields.values(), time.time(), task_id)
+        )
+
+    def log(self, task_id: str, message: str):
+        with self._lock:
+            self._pending.append((task_id, datetime.utcnow().isoformat(), message))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def get_logs(self, task_id: str, offset: int = 0) -> List[str]:
+        rows = self._query(
+            "SELECT message FROM task_logs WHERE task_id = ? ORDER BY seq LIMIT -1 OFFSET ?",
+            (task_id, max(0, offset))
+        )
+        return [r["message"] for r in rows]
+
+    def add_history(self, task_id: str, url: str, action: str, result: str):
+        self._execute(
+            "INSERT INTO task_history (task_id, url, action, result, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (task_id, url, action, result, datetime.utcnow().isoformat())
+        )
+
+    def list_tasks(self, offset: int = 0, limit: int = 50, status: Optional[str] = None, email: Optional[str] = None):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if email:
+            clauses.append("email = ?")
+            params.append(email)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        total = self._query(f"SELECT COUNT(*) AS n FROM tasks {where}", tuple(params))[0]["n"]
+        rows = self._query(
+            f"SELECT t.*, (SELECT COUNT(*) FROM task_logs l WHERE l.task_id = t.id) AS log_count "
+            f"FROM tasks t {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        )
+        return total, [self._row_to_task(r, r["log_count"]) for r in rows]
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        cutoff = now - self.retention_seconds
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock:
+            self._flush_locked()
+            abandoned = self._db.execute(
+                f"UPDATE tasks SET status = 'failed', error = ?, updated_at = ? "
+                f"WHERE updated_at < ? AND status NOT IN ({placeholders})",
+                (ABANDONED_ERROR, now, now - self.stale_seconds, *TERMINAL_STATUSES)
+            ).rowcount
+            if abandoned:
+                logger.warning(f"Marked {abandoned} abandoned tasks as failed")
+            expired = [r[0] for r in self._db.execute(
+                f"SELECT id FROM tasks WHERE updated_at < ? AND status IN ({placeholders})",
+                (cutoff, *TERMINAL_STATUSES)
+            ).fetchall()]
+            for task_id in expired:
+                self._db.execute("DELETE FROM task_logs WHERE task_id = ?", (task_id,))
+                self._db.execute("DELETE FROM task_history WHERE task_id = ?", (task_id,))
+                self._db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._db.commit()
+        return len(expired)
+
+def create_task_store(backend: str = TASK_STORE_BACKEND) -> TaskStore:
+    if backend == "memory":
+        return MemoryTaskStore()
+    if backend == "sqlite":
+        return SQLiteTaskStore()
+    raise ValueError(f"Unknown task store backend: {backend}")
+
+task_store = create_task_store()
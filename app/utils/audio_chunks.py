@@ -0,0 +1,43 @@
+import asyncio
+import glob
+import os
+import shutil
+import uuid
+from typing import List
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+async def split_audio(path: str, segment_seconds: int, out_dir: str) -> List[str]:
+    """
+    Cuts `path` into consecutive segments of about `segment_seconds` with ffmpeg (stream copy,
+    no re-encoding) and returns them in playback order. Falls back to [path] when ffmpeg is
+    missing or fails, so callers can always transcribe whatever is returned.
+    """
+    if not shutil.which("ffmpeg"):
+        logger.warning("ffmpeg not found, transcribing audio in one piece")
+        return [path]
+
+    ext = os.path.splitext(path)[1] or ".mp3"
+    prefix = os.path.join(out_dir, f"chunk_{uuid.uuid4().hex}_")
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", path,
+        "-f", "segment", "-segment_time", str(segment_seconds), "-c", "copy",
+        f"{prefix}%04d{ext}",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    chunks = sorted(glob.glob(f"{prefix}*{ext}"))
+    if process.returncode != 0 or not chunks:
+        logger.warning(f"ffmpeg segmenting failed ({stderr.decode(errors='replace').strip()}), using whole file")
+        remove_files(chunks)
+        return [path]
+    return chunks
+
+def remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,28 @@
+import time
+from typing import Optional
+
+class Deadline:
+    """
+    Time budget for one quiz chain, shared by every stage that can block.
+    Stages ask for a sub-timeout instead of using a fixed one, so nothing outlives the budget.
+    """
+    def __init__(self, seconds: float, expires_at: Optional[float] = None):
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def timeout(self, default: float, reserve: float = 0.0, minimum: float = 0.5) -> float:
+        """
+        The stage's own default, shrunk to what is left after keeping `reserve` seconds back.
+        """
+        return max(minimum, min(default, self.remaining() - reserve))
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.1f}s)"
@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import hashlib
+import io
+from typing import Dict, Any, List
+from app.config import (
+    IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_MAX_WIDTH, IMAGE_TILE_HEIGHT, IMAGE_MAX_TILES, IMAGE_SKIP_TEXT_CHARS
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Elements whose content only a screenshot can show
+VISUAL_SELECTOR = "img, canvas, svg, video, object, embed"
+
+def _data_url(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
+
+def prepare_image(png: bytes, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY, max_width: int = IMAGE_MAX_WIDTH,
+                  tile_height: int = IMAGE_TILE_HEIGHT, max_tiles: int = IMAGE_MAX_TILES) -> Dict[str, Any]:
+    """
+    Re-encodes a PNG screenshot for a vision call: downscaled to max_width, cut into tiles of
+    tile_height (at most max_tiles, top of the page first) and compressed as WebP/JPEG.
+    Returns {"images": [data URLs], "original_bytes", "bytes", "saved_bytes"}.
+    Without Pillow the PNG is passed through unchanged.
+    """
+    if not PIL_AVAILABLE:
+        return {"images": [_data_url(png, "image/png")], "original_bytes": len(png), "bytes": len(png), "saved_bytes": 0}
+
+    image = Image.open(io.BytesIO(png))
+    image = image.convert("RGB")  # drops alpha, which JPEG can't store
+    if image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+
+    fmt = fmt.lower()
+    pil_format, mime = ("WEBP", "image/webp") if fmt == "webp" else ("JPEG", "image/jpeg")
+    images, size = [], 0
+    for top in range(0, image.height, tile_height)[:max_tiles]:
+        tile = image.crop((0, top, image.width, min(top + tile_height, image.height)))
+        buffer = io.BytesIO()
+        tile.save(buffer, format=pil_format, quality=quality, optimize=True)
+        data = buffer.getvalue()
+        size += len(data)
+        images.append(_data_url(data, mime))
+    if image.height > tile_height * max_tiles:
+        logger.warning(f"Screenshot truncated to {max_tiles} tiles ({image.height}px tall)")
+    return {"images": images, "original_bytes": len(png), "bytes": size, "saved_bytes": len(png) - size}
+
+def visual_hash(image: bytes) -> str:
+    """
+    64-bit difference hash (dHash) of an encoded image, as hex: small rendering noise flips
+    few bits, a layout change flips many. Without Pillow it's a SHA-256 of the bytes, so any
+    change at all counts as a new layout.
+    """
+    if not PIL_AVAILABLE:
+        return hashlib.sha256(image).hexdigest()
+    pixels = list(Image.open(io.BytesIO(image)).convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+def visual_distance(a: str, b: str) -> int:
+    """
+    Differing bits between two visual_hash() values (64 when either is missing or they aren't comparable).
+    """
+    if not a or not b:
+        return 64
+    if len(a) == len(b) == 16:
+        return bin(int(a, 16) ^ int(b, 16)).count("1")
+    return 0 if a == b else 64
+
+def image_fingerprint(data_url: str) -> str:
+    return visual_hash(base64.b64decode(data_url.split(",", 1)[1]))
+
+def text_is_sufficient(text: str, visual_elements: int, min_chars: int = IMAGE_SKIP_TEXT_CHARS) -> bool:
+    """
+    True when the DOM text alone describes the page, so no screenshot needs to be sent.
+    """
+    return visual_elements == 0 and len(text.strip()) >= min_chars
+
+async def capture_page(page, text: str, full_page: bool = True, force: bool = False) -> Dict[str, Any]:
+    """
+    Screenshots a Playwright page for vision calls unless its text is sufficient.
+    Without Pillow, Playwright encodes a JPEG directly (no downscaling or tiling).
+    """
+    if not force:
+        visual_elements = await page.evaluate(f"document.querySelectorAll({VISUAL_SELECTOR!r}).length")
+        if text_is_sufficient(text, visual_elements):
+            return {"images": [], "original_bytes": 0, "bytes": 0, "saved_bytes": 0, "skipped": True}
+
+    if PIL_AVAILABLE:
+        png = await page.screenshot(full_page=full_page, scale="css")
+        # Decoding, resizing and re-encoding a full page takes long enough to stall the event loop
+        return await asyncio.to_thread(prepare_image, png)
+    jpeg = await page.screenshot(full_page=full_page, scale="css", type="jpeg", quality=IMAGE_QUALITY)
+    return {"images": [_data_url(jpeg, "image/jpeg")], "original_bytes": len(jpeg), "bytes": len(jpeg), "saved_bytes": 0}
+
+def image_parts(task_data: Dict[str, Any], detail: str = "auto") -> List[Dict[str, Any]]:
+    """
+    OpenAI image_url content parts for a task: prepared "images" from the scraper, or a raw
+    base64 PNG "screenshot" (as sent to /analyze).
+    """
+    urls = task_data.get("images") or []
+    if not urls and task_data.get("screenshot"):
+        urls = [f"data:image/png;base64,{task_data['screenshot']}"]
+    return [{"type": "image_url", "image_url": {"url": url, "detail": detail}} for url in urls]
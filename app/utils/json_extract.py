@@ -0,0 +1,80 @@
+import json
+import re
+from typing import Any, Dict, Optional
+
+_decoder = json.JSONDecoder()
+_BRACES = re.compile(r"[{}]")
+
+def _decode_at(text: str, start: int) -> Optional[Any]:
+    try:
+        obj, _ = _decoder.raw_decode(text, start)
+        return obj
+    except ValueError:
+        return None
+
+def extract_json(output: str, key: Optional[str] = "answer", max_attempts: int = 64) -> Optional[Dict[str, Any]]:
+    """
+    Returns the last JSON object in `output` that contains `key` (any object if key is None).
+
+    Braces are matched in one forward pass, then objects are tried from the end: each closing
+    brace's matching opening brace is handed to raw_decode. Spans are disjoint, so well-formed
+    output is parsed in linear time. Braces inside strings can break the matching; those
+    spans fall back to raw_decode at the nearest opening braces. Only decodes that fail or
+    come from that fallback count towards `max_attempts`; skipping a valid object without
+    the key is free, however much debug JSON follows the answer.
+    """
+    text = output.strip()
+    if not text:
+        return None
+
+    def wanted(obj) -> bool:
+        return isinstance(obj, dict) and (key is None or key in obj)
+
+    # Common case: the script printed nothing but the JSON
+    if text[0] == "{" and text[-1] == "}":
+        try:
+            obj, consumed = _decoder.raw_decode(text, 0)
+        except ValueError:
+            obj, consumed = None, 0
+        if consumed == len(text) and wanted(obj):
+            return obj
+
+    # Opening brace matching each closing brace (-1 when unbalanced)
+    matches, stack = {}, []
+    for brace in _BRACES.finditer(text):
+        if brace.group() == "{":
+            stack.append(brace.start())
+        else:
+            matches[brace.start()] = stack.pop() if stack else -1
+
+    end = len(text)
+    attempts = 0
+    while attempts < max_attempts:
+        close = text.rfind("}", 0, end)
+        if close == -1:
+            return None
+
+        start = matches[close]
+        if start != -1:
+            obj = _decode_at(text, start)
+            if wanted(obj):
+                return obj
+            if obj is not None:
+                # A valid object without the key: skip it as a whole
+                end = start
+                continue
+            attempts += 1
+
+        # Unbalanced (e.g. "}" inside a string): try the opening braces nearest to this close
+        opening = close
+        while attempts < max_attempts:
+            opening = text.rfind("{", 0, opening)
+            if opening == -1:
+                # No opening brace before this close, so none before any earlier one either
+                return None
+            attempts += 1
+            obj = _decode_at(text, opening)
+            if wanted(obj):
+                return obj
+        end = close
+    return None
@@ -0,0 +1,167 @@
+import base64
+import binascii
+import re
+from typing import Dict, Any, List, Optional
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+LINK_KINDS = {
+    "data": (".csv", ".tsv", ".json", ".xlsx", ".xls", ".parquet", ".txt", ".xml", ".zip"),
+    "pdf": (".pdf",),
+    "audio": (".mp3", ".wav", ".m4a", ".ogg", ".opus", ".flac"),
+    "image": (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg"),
+}
+ATOB_RE = re.compile(r"""atob\(\s*[`'"]([A-Za-z0-9+/=\s]+)[`'"]\s*\)""")
+URL_RE = re.compile(r"""https?://[^\s'"<>`)]+""")
+SCRIPT_RE = re.compile(r"<script\b([^>]*)>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+SCRIPT_SRC_RE = re.compile(r"""\bsrc\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+VISUAL_TAG_RE = re.compile(r"<(?:img|canvas|svg|video|object|embed)\b", re.IGNORECASE)
+_STRING = r"""(?:`[^`]*`|'[^']*'|"[^"]*")"""
+# Inline statements extract_page resolves without running JS: writing an atob() payload into the page
+RESOLVABLE_STATEMENT_RE = re.compile(
+    rf"""(?:document\.(?:querySelector|getElementById)\(\s*{_STRING}\s*\)\.(?:innerHTML|textContent|innerText)\s*=\s*{ATOB_RE.pattern}"""
+    rf"""|document\.write(?:ln)?\(\s*{ATOB_RE.pattern}\s*\))"""
+)
+
+def link_kind(url: str) -> str:
+    path = url.split("?")[0].split("#")[0].lower()
+    for kind, extensions in LINK_KINDS.items():
+        if path.endswith(extensions):
+            return kind
+    return "submit" if "submit" in path else "page"
+
+def _decode_atob(script: str) -> List[str]:
+    decoded = []
+    for payload in ATOB_RE.findall(script):
+        try:
+            decoded.append(base64.b64decode(re.sub(r"\s", "", payload)).decode("utf-8"))
+        except (binascii.Error, UnicodeDecodeError) as e:
+            logger.warning(f"Skipping undecodable atob payload: {e}")
+    return decoded
+
+def script_status(html: str, ignore_src=lambda src: False) -> str:
+    """
+    What a page's scripts mean for fetching it without a browser: "none" (static HTML),
+    "resolvable" (only atob() payloads written into the page, which extract_page decodes)
+    or "dynamic" (anything else, including external scripts unless ignore_src(src)).
+    """
+    status = "none"
+    for attrs, body in SCRIPT_RE.findall(html):
+        src = SCRIPT_SRC_RE.search(attrs)
+        if src:
+            if ignore_src(src.group(1)):
+                continue
+            return "dynamic"
+        if re.search(r"""\btype\s*=\s*["']?application/(?:ld\+)?json""", attrs, re.IGNORECASE):
+            continue
+        remainder = RESOLVABLE_STATEMENT_RE.sub("", body)
+        if re.sub(r"[\s;]", "", remainder):
+            return "dynamic"
+        if body.strip():
+            status = "resolvable"
+    return status
+
+def visual_element_count(html: str) -> int:
+    return len(VISUAL_TAG_RE.findall(html))
+
+def _tables(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    tables = []
+    for table in soup.find_all("table"):
+        rows = [
+            [cell.get_text(" ", strip=True) for cell in tr.find_all(["th", "td"])]
+            for tr in table.find_all("tr")
+        ]
+        rows = [row for row in rows if row]
+        if not rows:
+            continue
+        has_header = table.find("th") is not None
+        tables.append({"headers": rows[0] if has_header else [], "rows": rows[1:] if has_header else rows})
+    return tables
+
+def extract_page(html: str, base_url: str = "") -> Dict[str, Any]:
+    """
+    One pass over a page's HTML: visible text, links classified by kind, tables as rows,
+    decoded atob() payloads (parsed like the page itself), and <audio>/<img> sources.
+    Relative URLs are resolved against base_url.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    decoded = []
+    for script in soup.find_all("script"):
+        decoded.extend(_decode_atob(script.string or ""))
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+
+    # Payloads are usually HTML fragments written into the page, so parse them too,
+    # unless this is a rendered DOM that already contains them
+    main_text = soup.get_text("\n", strip=True)
+    fragments = [soup]
+    for payload in decoded:
+        fragment = BeautifulSoup(payload, "html.parser")
+        fragment_text = fragment.get_text("\n", strip=True)
+        if not fragment_text or fragment_text not in main_text:
+            fragments.append(fragment)
+
+    links, seen = [], set()
+    def add_link(url: str, text: str = ""):
+        url = urljoin(base_url, url.strip())
+        if url and url not in seen and not url.startswith(("javascript:", "mailto:", "data:")):
+            seen.add(url)
+            links.append({"url": url, "text": text, "kind": link_kind(url)})
+
+    audio, images, tables, texts = [], [], [], []
+    for fragment in fragments:
+        for a in fragment.find_all("a", href=True):
+            add_link(a["href"], a.get_text(" ", strip=True))
+        for tag in fragment.find_all(["audio", "source"]):
+            if tag.get("src"):
+                audio.append(urljoin(base_url, tag["src"]))
+        for img in fragment.find_all("img", src=True):
+            images.append(urljoin(base_url, img["src"]))
+        tables.extend(_tables(fragment))
+        text = fragment.get_text("\n", strip=True)
+        texts.append(text)
+        # Bare URLs in text (e.g. "POST your answer to https://...")
+        for url in URL_RE.findall(text):
+            add_link(url.rstrip(".,;"))
+
+    audio.extend(link["url"] for link in links if link["kind"] == "audio" and link["url"] not in audio)
+    return {
+        "text": "\n".join(t for t in texts if t),
+        "links": links,
+        "submit_urls": [link["url"] for link in links if link["kind"] == "submit"],
+        "tables": tables,
+        "decoded": decoded,
+        "audio": list(dict.fromkeys(audio)),
+        "images": list(dict.fromkeys(images)),
+    }
+
+def classify(page: Dict[str, Any]) -> Optional[str]:
+    """
+    Task type from structure alone ("audio" | "data"), or None when an LLM has to decide.
+    """
+    if page["audio"]:
+        return "audio"
+    if page["tables"] or any(link["kind"] in ("data", "pdf") for link in page["links"]):
+        return "data"
+    return None
+
+def summarize(page: Dict[str, Any], max_rows: int = 20) -> str:
+    """
+    Compact prompt text for solvers: page text followed by the structured findings.
+    """
+    parts = [page["text"]]
+    if page["links"]:
+        parts.append("Links:\n" + "\n".join(f"- [{link['kind']}] {link['url']} {link['text']}".rstrip() for link in page["links"]))
+    for idx, table in enumerate(page["tables"]):
+        rows = [table["headers"]] if table["headers"] else []
+        rows += table["rows"][:max_rows]
+        more = f"\n... {len(table['rows']) - max_rows} more rows" if len(table["rows"]) > max_rows else ""
+        parts.append(f"Table {idx + 1}:\n" + "\n".join(" | ".join(row) for row in rows) + more)
+    if page["audio"]:
+        parts.append("Audio: " + ", ".join(page["audio"]))
+    if page["images"]:
+        parts.append("Images: " + ", ".join(page["images"]))
+    return "\n\n".join(parts)
@@ -0,0 +1,158 @@
+import asyncio
+from typing import Dict, List, Optional
+from app.config import BROWSER_SETTLE_QUIET_MS, BROWSER_SETTLE_TIMEOUT_MS, BROWSER_READY_SELECTOR
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# One line per visible, meaningful element: `tag#id "text"` or `input[name="q"] value="..."`
+OUTLINE_JS = """
+(limit) => {
+  const selector = 'h1,h2,h3,h4,label,button,a[href],input,select,textarea,[role=button],[id],p,li,th,td,pre';
+  const lines = [];
+  for (const el of document.querySelectorAll(selector)) {
+    if (lines.length >= limit) break;
+    const rect = el.getBoundingClientRect();
+    const style = getComputedStyle(el);
+    if ((!rect.width && !rect.height) || style.visibility === 'hidden' || style.display === 'none') continue;
+    const tag = el.tagName.toLowerCase();
+    let ref = tag;
+    if (el.id) ref += '#' + el.id;
+    else if (el.getAttribute('name')) ref += `[name="${el.getAttribute('name')}"]`;
+    let detail;
+    if (['input', 'select', 'textarea'].includes(tag)) {
+      const type = el.getAttribute('type');
+      detail = (type ? `type=${type} ` : '') + `value="${el.value}"` + (el.placeholder ? ` placeholder="${el.placeholder}"` : '');
+    } else {
+      const text = (el.innerText || '').replace(/\\s+/g, ' ').trim();
+      if (!text && !['button', 'a'].includes(tag)) continue;
+      detail = JSON.stringify(text.length > 80 ? text.slice(0, 77) + '...' : text);
+    }
+    lines.push(`${ref} ${detail}`);
+  }
+  return lines;
+}
+"""
+
+# Resolves once the DOM has seen no mutation for `quiet` ms (or after `timeout` ms)
+DOM_QUIET_JS = """
+([quiet, timeout]) => new Promise(resolve => {
+  let timer;
+  const finish = () => { observer.disconnect(); clearTimeout(timer); clearTimeout(cap); resolve(); };
+  const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(finish, quiet); });
+  observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+  timer = setTimeout(finish, quiet);
+  const cap = setTimeout(finish, timeout);
+})
+"""
+
+# Whether the ready element has text yet; null when the page has no such element
+READY_JS = """
+(selector) => {
+  const el = document.querySelector(selector);
+  return el ? el.innerText.trim().length > 0 : null;
+}
+"""
+
+async def outline_page(page, limit: int = 150) -> List[str]:
+    """
+    Compact text view of the visible page (headings, text blocks, links, form fields).
+    """
+    return await page.evaluate(OUTLINE_JS, limit)
+
+def diff_outline(previous: List[str], current: List[str]) -> Dict[str, List[str]]:
+    before, after = set(previous), set(current)
+    return {
+        "added": [line for line in current if line not in before],
+        "removed": [line for line in previous if line not in after],
+    }
+
+def describe_diff(diff: Dict[str, List[str]], limit: int = 40) -> str:
+    if not diff["added"] and not diff["removed"]:
+        return "Page elements: no change."
+    parts = []
+    for label, sign in (("added", "+"), ("removed", "-")):
+        lines = diff[label]
+        parts.extend(f"{sign} {line}" for line in lines[:limit])
+        if len(lines) > limit:
+            parts.append(f"{sign} ... {len(lines) - limit} more")
+    return "Page element changes:\n" + "\n".join(parts)
+
+class NetworkTracker:
+    """
+    Counts a page's in-flight requests through its request events. Pages are pooled,
+    so call detach() before handing the page back.
+    """
+    def __init__(self, page):
+        self.page = page
+        self.inflight = 0
+        page.on("request", self._started)
+        page.on("requestfinished", self._finished)
+        page.on("requestfailed", self._finished)
+
+    def _started(self, request):
+        self.inflight += 1
+
+    def _finished(self, request):
+        self.inflight = max(0, self.inflight - 1)
+
+    def detach(self):
+        self.page.remove_listener("request", self._started)
+        self.page.remove_listener("requestfinished", self._finished)
+        self.page.remove_listener("requestfailed", self._finished)
+
+async def settle(page, tracker: Optional[NetworkTracker] = None, quiet_ms: int = BROWSER_SETTLE_QUIET_MS,
+                 timeout_ms: int = BROWSER_SETTLE_TIMEOUT_MS) -> float:
+    """
+    Waits until the page stops changing after an action: no DOM mutation for quiet_ms and
+    no request in flight, bounded by timeout_ms. Navigations are followed to the new
+    document. Returns the seconds waited.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    end = start + timeout_ms / 1000
+    while True:
+        remaining = end - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            await page.evaluate(DOM_QUIET_JS, [quiet_ms, int(remaining * 1000)])
+        except Exception:
+            # The action navigated away and destroyed the context we were observing
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=max(remaining * 1000, 1))
+            except Exception:
+                break
+            continue
+        if tracker is None or tracker.inflight == 0:
+            break
+        await asyncio.sleep(min(quiet_ms / 1000, max(0.0, end - loop.time())))
+    return round(loop.time() - start, 3)
+
+async def wait_ready(page, timeout_ms: int, selector: str = BROWSER_READY_SELECTOR) -> str:
+    """
+    Replaces waiting for networkidle after a domcontentloaded navigation: a page with the
+    ready element is ready once it has text, any other page once its DOM settles.
+    Images still loading get whatever time is left. Returns how readiness was decided:
+    "selector", "settled" or "timeout".
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout_ms / 1000
+    outcome = "settled"
+    try:
+        state = await page.evaluate(READY_JS, selector) if selector else None
+        if state is None:
+            await settle(page, timeout_ms=timeout_ms)
+        else:
+            outcome = "selector"
+            if not state:
+                await page.wait_for_function(READY_JS, arg=selector, timeout=timeout_ms)
+    except Exception:
+        outcome = "timeout"
+    remaining = end - loop.time()
+    if remaining > 0:
+        try:
+            await page.wait_for_load_state("load", timeout=remaining * 1000)
+        except Exception:
+            pass
+    return outcome
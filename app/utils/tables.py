@@ -0,0 +1,83 @@
+import os
+from typing import Optional
+import pandas as pd
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+TABLE_EXTENSIONS = (".csv", ".tsv", ".json", ".xlsx", ".xls", ".parquet")
+# Suffixes of parsed copies written next to a source file
+PARSED_SUFFIXES = (".table.arrow", ".table.pkl")
+
+def read_table(path: str) -> pd.DataFrame:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return pd.read_csv(path)
+    if ext == ".tsv":
+        return pd.read_csv(path, sep="\t")
+    if ext == ".json":
+        return pd.read_json(path)
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(path)
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    raise ValueError(f"Not a table file: {path}")
+
+def parsed_path(path: str) -> str:
+    """
+    Where the parsed copy of `path` lives: an uncompressed Arrow IPC file when pyarrow is
+    installed (memory-mappable, see open_parsed), else a pickle.
+    """
+    return os.path.splitext(path)[0] + (PARSED_SUFFIXES[0] if PYARROW_AVAILABLE else PARSED_SUFFIXES[1])
+
+def convert_table(path: str) -> Optional[str]:
+    """
+    Parses a downloaded CSV/TSV/JSON/Excel file once and stores it in a ready-to-load format.
+    Returns the parsed file's path, or None when the file isn't a table we can read.
+    """
+    if not path.lower().endswith(TABLE_EXTENSIONS):
+        return None
+    if path.lower().endswith(".parquet") and not PYARROW_AVAILABLE:
+        return None
+    target = parsed_path(path)
+    if os.path.exists(target):
+        return target
+    try:
+        frame = read_table(path)
+        tmp = f"{target}.tmp"
+        if PYARROW_AVAILABLE:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            frame.to_pickle(tmp)
+        os.replace(tmp, target)
+        return target
+    except Exception as e:
+        logger.warning(f"Could not parse {os.path.basename(path)} as a table: {e}")
+        return None
+
+def remove_parsed(path: str):
+    base = os.path.splitext(path)[0]
+    for suffix in PARSED_SUFFIXES:
+        try:
+            os.remove(base + suffix)
+        except OSError:
+            pass
+
+def open_parsed(path: str):
+    """
+    Opens a parsed copy without re-parsing: Arrow IPC files are memory-mapped, so the
+    returned pyarrow.Table shares pages with every other process reading the same file.
+    Pickles are loaded into a DataFrame.
+    """
+    if path.endswith(PARSED_SUFFIXES[0]):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return pd.read_pickle(path)
@@ -15,3 +15,8 @@ PORT = int(os.getenv("PORT", 8000))
 # Timeout settings
 BROWSER_TIMEOUT = 60000 
 SUBMISSION_TIMEOUT = 180
+# Total time allowed for a quiz chain, counted from the /run request
+TASK_DEADLINE_SECONDS = int(os.getenv("TASK_DEADLINE_SECONDS", 180))
+
+# Number of candidate programs raced per solving attempt (1 disables speculation)
+SPECULATIVE_CANDIDATES = int(os.getenv("SPECULATIVE_CANDIDATES", 3))
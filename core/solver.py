@@ -1,52 +1,64 @@
-import os
-import subprocess
-import sys
+import asyncio
 import json
 import logging
-from openai import OpenAI
-from config import AIPROXY_TOKEN, OPENAI_API_KEY, OPENAI_BASE_URL
+import time
+from collections import Counter
+from contextlib import contextmanager
+from app.services.llm_service import llm_client
+from app.services.sandbox import sandbox_pool
+from app.services.artifact_cache import artifact_cache, describe_artifacts, prepared_tables
+from app.services.answer_cache import answer_cache
+from app.services.program_library import program_library, template
+from app.services.metrics import metrics
+from app.config import DEADLINE_SUBMIT_RESERVE_SECONDS, DEADLINE_VISION_MIN_SECONDS
+from app.utils.deadline import Deadline
+from app.utils.image_prep import image_parts
+from app.utils.page_extract import classify, summarize
+from app.utils.json_extract import extract_json
 
 logger = logging.getLogger(__name__)
 
-class TaskSolver:
-    def __init__(self):
-        api_key = AIPROXY_TOKEN or OPENAI_API_KEY
-        if not api_key:
-            logger.warning("No API key found. Solver will fail.")
-        
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=OPENAI_BASE_URL if AIPROXY_TOKEN else None
-        )
+# (temperature, extra instruction) per speculative candidate. The first one is the regular prompt.
+CANDIDATE_STRATEGIES = [
+    (0.0, None),
+    (0.4, "Take the most direct pandas approach and sanity-check intermediate values."),
+    (0.7, "Re-read the question carefully and double-check edge cases: headers, units, data types, filtering."),
+    (0.9, "Solve it with a different method than the obvious one, then verify the result."),
+]
 
-    def _call_llm(self, messages: list, model: str = "gpt-4o-mini", response_format=None) -> str:
-        try:
-            logger.info(f"Calling LLM {model}")
-            kwargs = {
-                "model": model,
-                "messages": messages,
-                "temperature": 0
-            }
-            if response_format:
-                kwargs["response_format"] = response_format
-                
-            response = self.client.chat.completions.create(**kwargs)
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"LLM call failed: {e}")
-            raise
+@contextmanager
+def _timed(timings: dict, stage: str):
+    """
+    Records the wall time of a stage. Parallel runs of one stage keep the slowest (critical path).
+    Every run is also a metrics span.
+    """
+    start = time.perf_counter()
+    try:
+        with metrics.span(stage):
+            yield
+    finally:
+        elapsed = round(time.perf_counter() - start, 3)
+        timings[stage] = max(timings.get(stage, 0.0), elapsed)
+
+class TaskSolver:
+    async def _call_llm(self, messages: list, model: str = "gpt-4o-mini", response_format=None, temperature: float = 0, use_cache: bool = True, deadline: Deadline = None) -> str:
+        # Goes through the shared async client so a completion never blocks the event loop
+        timeout = deadline.timeout(120, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else None
+        return await llm_client.call(messages, model=model, response_format=response_format, temperature=temperature, use_cache=use_cache, timeout=timeout)
 
-    def analyze_task(self, task_data: dict) -> dict:
+    async def analyze_task(self, task_data: dict, deadline: Deadline = None) -> dict:
         """
         Reasoning Agent: Analyzes text and screenshot to understand the task.
         """
-        text_content = task_data.get("text", "")
-        screenshot_b64 = task_data.get("screenshot", "")
+        # Structured extraction (links, tables, decoded payloads) beats raw body text when present
+        structured = task_data.get("structured")
+        text_content = summarize(structured) if structured else task_data.get("text", "")
         
         system_prompt = """
 You are an expert Data Analyst and Logic Reasoner.
 Your goal is to deconstruct a data processing task.
-You will be given the text content of a webpage and a screenshot.
+You will be given the text content of a webpage and, unless the text covers everything, a screenshot
+(tall pages are split into several images, top to bottom).
 
 Output a JSON object with the following structure:
 {
@@ -60,27 +72,23 @@ Output a JSON object with the following structure:
         user_content = [
             {"type": "text", "text": f"Webpage Text Content:\n{text_content}"}
         ]
-        
-        if screenshot_b64:
-            user_content.append({
-                "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{screenshot_b64}"}
-            })
+        # Screenshot tiles (top to bottom); none when the DOM text was sufficient
+        user_content.extend(image_parts(task_data))
 
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content}
         ]
         
-        response = self._call_llm(messages, model="gpt-4o", response_format={"type": "json_object"})
+        response = await self._call_llm(messages, model="gpt-4o", response_format={"type": "json_object"}, deadline=deadline)
         return json.loads(response)
 
-    def extract_visual_data(self, task_data: dict, question: str) -> str:
+    async def extract_visual_data(self, task_data: dict, question: str = None, deadline: Deadline = None) -> str:
         """
         Vision Agent: Extracts specific data from the screenshot.
         """
-        screenshot_b64 = task_data.get("screenshot", "")
-        if not screenshot_b64:
+        images = image_parts(task_data, detail="high")
+        if not images:
             return "No screenshot available."
             
         system_prompt = """
@@ -91,14 +99,15 @@ Return ONLY the extracted data in a structured format (CSV, JSON, or plain text)
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": [
-                {"type": "text", "text": f"Extract data relevant to this question: {question}"},
-                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{screenshot_b64}"}}
+                {"type": "text", "text": f"Extract data relevant to this question: {question}" if question
+                    else "Extract all data shown (tables, chart values, numbers and any text that looks like task data)."},
+                *images
             ]}
         ]
         
-        return self._call_llm(messages, model="gpt-4o")
+        return await self._call_llm(messages, model="gpt-4o", deadline=deadline)
 
-    def generate_code(self, plan: dict, visual_data: str = None, feedback: str = None) -> str:
+    async def generate_code(self, plan: dict, visual_data: str = None, feedback: str = None, temperature: float = 0, hint: str = None, deadline: Deadline = None, artifacts: dict = None) -> str:
         """
         Coding Agent: Generates Python code based on the plan.
         """
@@ -122,15 +131,20 @@ Your code MUST:
         user_prompt = f"Plan: {json.dumps(plan, indent=2)}\n"
         if visual_data:
             user_prompt += f"\nVisual Data Extracted: {visual_data}\n"
+        if artifacts:
+            user_prompt += f"\n{describe_artifacts(artifacts)}"
         if feedback:
             user_prompt += f"\nPrevious Attempt Feedback: {feedback}\n"
+        if hint:
+            user_prompt += f"\nApproach: {hint}\n"
             
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
         
-        code = self._call_llm(messages, model="gpt-4o")
+        # Sampled candidates must not collapse onto one cached completion
+        code = await self._call_llm(messages, model="gpt-4o", temperature=temperature, use_cache=temperature == 0, deadline=deadline)
         
         # Clean up markdown
         if code.startswith("```python"):
@@ -139,68 +153,318 @@ Your code MUST:
             code = code.replace("```", "")
         return code.strip()
 
-    def execute_code(self, code: str) -> str:
+    async def execute_code(self, code: str, timeout: float = 60, tables: dict = None) -> str:
+        """
+        Executes the generated code in a warm sandbox worker and captures stdout.
+        `tables` (url -> prepared file) become available to the code through load_table(url).
+        """
+        result = await sandbox_pool.run(code, timeout=timeout, tables=tables)
+        metrics.add(bytes_out=len(code), bytes_in=len(result["stdout"]) + len(result["stderr"]))
+        if result["returncode"] != 0:
+            raise Exception(f"Execution error: {result['stderr']}")
+        return result["stdout"].strip()
+
+    def _parse_output(self, output: str, analysis: dict) -> dict:
+        result = extract_json(output)
+        if result is None:
+            # Try to salvage if it's just the answer
+            return {"answer": output, "submit_url": analysis.get("submit_url")}
+        if not result.get("submit_url"):
+            result["submit_url"] = analysis.get("submit_url")
+        return result
+
+    def _execution_timeout(self, deadline: Deadline = None) -> float:
+        return deadline.timeout(60, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else 60
+
+    async def _run_candidate(self, analysis: dict, visual_data: str, feedback: str, temperature: float, hint: str, timings: dict, deadline: Deadline = None, artifacts: dict = None) -> dict:
+        with _timed(timings, "codegen"):
+            code = await self.generate_code(analysis, visual_data, feedback, temperature=temperature, hint=hint, deadline=deadline, artifacts=artifacts)
+        with _timed(timings, "execute"):
+            output = await self.execute_code(code, timeout=self._execution_timeout(deadline), tables=prepared_tables(artifacts))
+        result = self._parse_output(output, analysis)
+        result["code"] = code
+        return result
+
+    @staticmethod
+    def _vote_key(answer) -> str:
+        if isinstance(answer, float):
+            answer = round(answer, 6)
+        elif isinstance(answer, str):
+            answer = answer.strip()
+        return json.dumps(answer, sort_keys=True, default=str)
+
+    async def solve_speculative(self, analysis: dict, visual_data: str = None, feedback: str = None, candidates: int = 3, timings: dict = None, deadline: Deadline = None, artifacts: dict = None) -> dict:
         """
-        Executes the generated code and captures stdout.
+        Generates and executes several candidate programs concurrently, then votes on their answers.
+        The winner carries the remaining distinct answers (best first) in "alternatives".
+        When the deadline is close, the vote uses whichever candidates have finished.
         """
-        import uuid
-        filename = f"temp_solution_{uuid.uuid4().hex}.py"
+        timings = {} if timings is None else timings
+        strategies = CANDIDATE_STRATEGIES[:max(1, candidates)]
+        logger.info(f"Racing {len(strategies)} candidate programs...")
+        tasks = [
+            asyncio.create_task(self._run_candidate(analysis, visual_data, feedback, t, hint, timings, deadline, artifacts))
+            for t, hint in strategies
+        ]
+        wait_for = deadline.timeout(float("inf"), reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else None
+        done, pending = await asyncio.wait(tasks, timeout=wait_for)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Deadline: voting with {len(done)}/{len(tasks)} finished candidates")
+        outcomes = [
+            (task.exception() or task.result()) if task in done else asyncio.TimeoutError("cut off by deadline")
+            for task in tasks
+        ]
+
+        valid = []
+        for idx, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Candidate {idx} failed: {outcome}")
+            elif isinstance(outcome, dict) and outcome.get("answer") not in (None, ""):
+                valid.append(outcome)
+        if not valid:
+            errors = [str(o) for o in outcomes if isinstance(o, Exception)]
+            raise Exception(f"All {len(strategies)} candidates failed: {errors}")
+
+        # Majority vote; ties go to the earlier (lower temperature) candidate
+        votes = Counter(self._vote_key(r["answer"]) for r in valid)
+        ranked, seen = [], set()
+        for result in sorted(valid, key=lambda r: -votes[self._vote_key(r["answer"])]):
+            key = self._vote_key(result["answer"])
+            if key not in seen:
+                seen.add(key)
+                ranked.append(result)
+
+        best = dict(ranked[0])
+        best["votes"] = votes[self._vote_key(best["answer"])]
+        best["candidates"] = len(strategies)
+        best["alternatives"] = ranked[1:]
+        logger.info(f"Speculative vote: {dict(votes)}")
+        return best
+
+    async def _timed_vision(self, task_data: dict, timings: dict, question: str = None, deadline: Deadline = None) -> str:
+        # Only completed extractions are timed; a cancelled one is reported as vision_discarded
+        start = time.perf_counter()
+        with metrics.span("vision"):
+            visual_data = await self.extract_visual_data(task_data, question, deadline=deadline)
+        timings["vision"] = round(time.perf_counter() - start, 3)
+        return visual_data
+
+    async def _analyze_and_extract(self, task_data: dict, timings: dict, deadline: Deadline = None):
+        """
+        Runs analysis and vision extraction side by side on the first attempt.
+        Vision is cancelled as soon as the analysis says it isn't needed, and skipped
+        altogether when the deadline leaves no room for an optional stage.
+        Pages whose structure already yields the data don't start vision speculatively;
+        it only runs if the analysis still asks for it.
+        """
+        vision_task = None
+        vision_allowed = not deadline or deadline.allows(DEADLINE_VISION_MIN_SECONDS)
+        if not vision_allowed:
+            timings["vision_skipped"] = True
+        structured = task_data.get("structured")
+        speculate = not (structured and classify(structured))
+        if image_parts(task_data) and vision_allowed and speculate:
+            vision_task = asyncio.create_task(self._timed_vision(task_data, timings, deadline=deadline))
+            # Retrieve the exception of a discarded extraction so it isn't reported as unhandled
+            vision_task.add_done_callback(lambda t: t.cancelled() or t.exception())
         try:
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(code)
-            
-            result = subprocess.run(
-                [sys.executable, filename],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
-            
-            if result.returncode != 0:
-                raise Exception(f"Execution error: {result.stderr}")
-                
-            return result.stdout.strip()
-        except Exception as e:
+            logger.info("Analyzing task...")
+            with _timed(timings, "analyze"):
+                task_data["analysis"] = await self.analyze_task(task_data, deadline=deadline)
+            logger.info(f"Analysis: {task_data['analysis']}")
+        except BaseException:
+            if vision_task:
+                vision_task.cancel()
             raise
-        finally:
-            if os.path.exists(filename):
-                os.remove(filename)
 
-    def solve(self, task_data: dict, feedback: str = None, model: str = "gpt-4o"):
+        if not task_data["analysis"].get("visual_extraction_needed"):
+            if vision_task:
+                # Fire-and-forget: code generation doesn't wait for the cancellation
+                vision_task.cancel()
+                timings["vision_discarded"] = True
+            task_data["visual_data"] = None
+        elif vision_task:
+            logger.info("Waiting for visual data...")
+            task_data["visual_data"] = await vision_task
+        elif image_parts(task_data) and vision_allowed:
+            logger.info("Analysis needs visual data, extracting...")
+            task_data["visual_data"] = await self._timed_vision(task_data, timings, deadline=deadline)
+        else:
+            task_data["visual_data"] = None
+
+    async def _prefetch(self, task_data: dict, timings: dict) -> dict:
+        """
+        Waits for the linked data files the scraper started prefetching (or starts now).
+        Failures only mean the generated script fetches that URL itself.
+        """
+        background = task_data.pop("prefetch", None)
+        if background is None:
+            links = (task_data.get("structured") or {}).get("links", [])
+            background = artifact_cache.start_prefetch(links)
+        if background is None:
+            return {}
+        # Shielded: giving up on the wait must not abort downloads other chains can reuse
+        with _timed(timings, "prefetch_wait"):
+            return await asyncio.shield(background)
+
+    async def _await_artifacts(self, task_data: dict, prefetch_task, deadline: Deadline = None) -> dict:
+        if "artifacts" not in task_data:
+            try:
+                # A slow download must not hold up code generation for long
+                wait = deadline.timeout(60, reserve=DEADLINE_SUBMIT_RESERVE_SECONDS) if deadline else 60
+                task_data["artifacts"] = await asyncio.wait_for(prefetch_task, timeout=wait) if prefetch_task else {}
+            except asyncio.TimeoutError:
+                logger.warning("Prefetch too slow, generated code will download the files itself")
+                task_data["artifacts"] = {}
+        return task_data["artifacts"]
+
+    @staticmethod
+    def cache_key_parts(task_data: dict):
+        """
+        (page text, artifact content hashes) identifying the task in the answer cache.
+        """
+        text = (task_data.get("structured") or {}).get("text") or task_data.get("text", "")
+        hashes = [artifact["sha256"] for artifact in (task_data.get("artifacts") or {}).values()]
+        return text, hashes
+
+    async def _solve_from_cache(self, task_data: dict, prefetch_task, timings: dict, deadline: Deadline = None):
+        """
+        Re-runs the program that solved this exact quiz before. Only a reproduced answer is
+        returned (with "cached": True). A run that finishes with a different answer invalidates
+        the entry; one that fails (timeout, crashed worker, error) just falls back to a solve.
+        """
+        text, _ = self.cache_key_parts(task_data)
+        entry = None
+        if text and answer_cache.known(text):
+            artifacts = await self._await_artifacts(task_data, prefetch_task, deadline)
+            text, hashes = self.cache_key_parts(task_data)
+            entry = answer_cache.get(text, hashes)
+        if not entry:
+            answer_cache.record_miss()
+            return None
+
+        logger.info("Answer cache hit, re-running the verified program")
+        try:
+            with _timed(timings, "cached_program"):
+                output = await self.execute_code(entry["code"], timeout=self._execution_timeout(deadline), tables=prepared_tables(artifacts))
+        except Exception as e:
+            logger.warning(f"Cached program failed, keeping the entry: {e}")
+            answer_cache.record_miss()
+            return None
+        result = self._parse_output(output, {"submit_url": entry["submit_url"]})
+        if self._vote_key(result.get("answer")) != self._vote_key(entry["answer"]):
+            answer_cache.invalidate(text, hashes)
+            answer_cache.record_miss()
+            return None
+        answer_cache.record_hit(text, hashes)
+        result.update({"code": entry["code"], "cached": True})
+        return result
+
+    @staticmethod
+    def library_key(task_data: dict):
+        """
+        (template signature, slots) of the task in the program library.
+        """
+        structured = task_data.get("structured") or {}
+        text = structured.get("text") or task_data.get("text", "")
+        return template(text, [link["url"] for link in structured.get("links", [])])
+
+    async def _solve_from_library(self, task_data: dict, prefetch_task, timings: dict, deadline: Deadline = None):
+        """
+        Runs a verified program from an earlier quiz of the same template, with its literals
+        adapted to this quiz. The answer is unverified (returned with "reused": True), so a
+        program that fails, prints nothing usable or can't be adapted means a regular solve.
+        """
+        signature, slots = self.library_key(task_data)
+        entry = program_library.get(signature)
+        if not entry:
+            return None
+        artifacts = await self._await_artifacts(task_data, prefetch_task, deadline)
+        code = program_library.adapt(entry, slots, artifacts)
+        if code is None:
+            logger.info("Library program can't be adapted to this quiz")
+            return None
+
+        logger.info("Program library hit, running the adapted program")
+        submit_urls = (task_data.get("structured") or {}).get("submit_urls") or [None]
+        try:
+            with _timed(timings, "library_program"):
+                output = await self.execute_code(code, timeout=self._execution_timeout(deadline), tables=prepared_tables(artifacts))
+            result = self._parse_output(output, {"submit_url": submit_urls[0]})
+        except Exception as e:
+            logger.warning(f"Library program failed: {e}")
+            return None
+        if result.get("answer") in (None, "") or not result.get("submit_url"):
+            return None
+        program_library.record_use(signature)
+        result.update({"code": code, "reused": True})
+        return result
+
+    async def solve(self, task_data: dict, feedback: str = None, model: str = "gpt-4o", candidates: int = 1, deadline: Deadline = None):
         """
         Orchestrates the multi-agent flow.
+        With candidates > 1, code generation and execution run speculatively (see solve_speculative).
+        Every LLM call and the execution timeout are shrunk to fit the optional deadline.
+        Linked data files are prefetched (from scrape time on) and parsed into the artifact
+        cache while the LLM works, and the generated code is told their local paths.
+        A quiz solved before (answer cache) is answered by re-running its program, without LLM calls;
+        one from a known template first tries the library program adapted to it (program library).
+        The program behind an answer is returned under "code", per-stage wall times under "timings".
         """
+        timings = {}
+        started = time.perf_counter()
+        prefetch_task = None
+        if "artifacts" not in task_data:
+            prefetch_task = asyncio.create_task(self._prefetch(task_data, timings))
         try:
-            # 1. Analyze Task (Reasoning)
-            # Only re-analyze if it's the first attempt (no feedback) or if analysis is missing
-            if not feedback or not hasattr(self, 'analysis'):
-                logger.info("Analyzing task...")
-                self.analysis = self.analyze_task(task_data)
-                logger.info(f"Analysis: {self.analysis}")
-            
-            # 2. Vision Extraction (if needed)
-            visual_data = None
-            if self.analysis.get("visual_extraction_needed"):
-                logger.info("Extracting visual data...")
-                visual_data = self.extract_visual_data(task_data, self.analysis["question"])
-            
-            # 3. Generate Code (Coding)
-            logger.info("Generating code...")
-            code = self.generate_code(self.analysis, visual_data, feedback)
-            
-            # 4. Execute
-            logger.info("Executing code...")
-            result = self.execute_code(code)
+            if not feedback:
+                cached = await self._solve_from_cache(task_data, prefetch_task, timings, deadline)
+                if not cached:
+                    cached = await self._solve_from_library(task_data, prefetch_task, timings, deadline)
+                if cached:
+                    timings["total"] = round(time.perf_counter() - started, 3)
+                    cached["timings"] = timings
+                    return cached
+
+            # 1+2. Analyze Task (Reasoning) while Vision Extraction runs speculatively.
+            # Only re-analyze if it's the first attempt (no feedback) or if analysis is missing.
+            # The analysis lives on task_data (not the shared solver) so concurrent chains don't mix.
+            if not feedback or "analysis" not in task_data:
+                await self._analyze_and_extract(task_data, timings, deadline)
+            analysis = task_data["analysis"]
+            visual_data = task_data.get("visual_data")
+            artifacts = await self._await_artifacts(task_data, prefetch_task, deadline)
             
-            # Parse result
-            try:
-                return json.loads(result)
-            except:
-                # Try to salvage if it's just the answer
-                return {"answer": result, "submit_url": self.analysis.get("submit_url")}
+            if candidates > 1:
+                result = await self.solve_speculative(analysis, visual_data, feedback, candidates, timings, deadline, artifacts)
+            else:
+                # 3. Generate Code (Coding)
+                logger.info("Generating code...")
+                with _timed(timings, "codegen"):
+                    code = await self.generate_code(analysis, visual_data, feedback, deadline=deadline, artifacts=artifacts)
+                
+                # 4. Execute
+                logger.info("Executing code...")
+                with _timed(timings, "execute"):
+                    output = await self.execute_code(code, timeout=self._execution_timeout(deadline), tables=prepared_tables(artifacts))
+                
+                # Parse result
+                result = self._parse_output(output, analysis)
+                result["code"] = code
+
+            if isinstance(result, dict):
+                timings["total"] = round(time.perf_counter() - started, 3)
+                result["timings"] = timings
+            return result
                 
         except Exception as e:
             logger.error(f"Solver failed: {e}")
-            return {"error": str(e)}
+            timings["total"] = round(time.perf_counter() - started, 3)
+            return {"error": str(e), "timings": timings}
+        finally:
+            if prefetch_task and not prefetch_task.done():
+                prefetch_task.cancel()
 
 solver = TaskSolver()
@@ -1,18 +1,17 @@
-import httpx
 import logging
+from app.services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
-async def submit_result(submit_url: str, payload: dict) -> dict:
+async def submit_result(submit_url: str, payload: dict, timeout: float = 10.0) -> dict:
     """
     Submits the result to the given URL.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Submitting to {submit_url} with payload: {payload}")
-            response = await client.post(submit_url, json=payload, timeout=10.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            logger.error(f"Submission failed: {e}")
-            raise
+    try:
+        logger.info(f"Submitting to {submit_url} with payload: {payload}")
+        response = await http_client.post(submit_url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        logger.error(f"Submission failed: {e}")
+        raise
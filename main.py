@@ -1,18 +1,33 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, status
+from fastapi import FastAPI, HTTPException, Query, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field
+import json
 import logging
 import uvicorn
 import os
-import uuid
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
 from core.browser import scraper
 from core.solver import solver
 from core.submitter import submit_result
-from config import HOST, PORT
+from app.services.llm_service import llm_client
+from app.services.sandbox import sandbox_pool
+from app.services.http_client import http_client
+from app.services.task_events import task_events
+from app.services.task_store import task_store, TERMINAL_STATUSES
+from app.services.scheduler import task_scheduler, QueueFullError
+from app.services.answer_cache import answer_cache
+from app.services.program_library import program_library
+from app.services.artifact_cache import artifact_cache
+from app.services.request_router import request_router
+from app.services.task_fetcher import task_fetcher
+from app.services.metrics import metrics
+from app.config import DEADLINE_SUBMIT_RESERVE_SECONDS
+from app.utils.deadline import Deadline
+from config import HOST, PORT, SPECULATIVE_CANDIDATES, TASK_DEADLINE_SECONDS
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -32,8 +47,34 @@ app = FastAPI(
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# In-memory storage for task status (Use Redis/DB in production)
-TASKS: Dict[str, Dict[str, Any]] = {}
+# Task state lives in the shared task store (SQLite by default, see TASK_STORE_BACKEND)
+
+metrics.add_collector("llm", lambda: {"cost_usd": llm_client.total_cost, **{f"cache_{k}": v for k, v in llm_client.cache.stats.items()}})
+metrics.add_collector("queue", task_scheduler.snapshot)
+metrics.add_collector("fetch", lambda: task_fetcher.stats)
+metrics.add_collector("http", lambda: http_client.stats)
+metrics.add_collector("browser_requests", request_router.snapshot)
+metrics.add_collector("artifacts", artifact_cache.snapshot)
+metrics.add_collector("answer_cache", answer_cache.snapshot)
+metrics.add_collector("program_library", program_library.snapshot)
+
+def _log(task_id: str, message: str):
+    task_store.log(task_id, message)
+    task_events.notify(task_id)
+
+def _update_task(task_id: str, **fields):
+    task_store.update(task_id, **fields)
+    task_events.notify(task_id)
+
+def _task_summary(task: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "task_id": task["id"],
+        "status": task["status"],
+        "created_at": task["created_at"],
+        "log_count": task["log_count"],
+        "result": task.get("result"),
+        "error": task.get("error")
+    }
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -46,13 +87,31 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Prometheus text format: per-stage latency histograms, tokens, cost and bytes, plus service counters.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return FileResponse("static/index.html")
 
 @app.get("/tasks")
-async def list_tasks():
-    return TASKS
+async def list_tasks(offset: int = 0, limit: int = 50, status_filter: Optional[str] = Query(None, alias="status")):
+    """
+    Paginated task summaries, newest first. Logs are served by /tasks/{task_id} and its stream.
+    """
+    limit = max(1, min(limit, 200))
+    total, tasks = task_store.list_tasks(offset=max(0, offset), limit=limit, status=status_filter)
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "items": [_task_summary(task) for task in tasks],
+        "queue": task_scheduler.snapshot()
+    }
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
@@ -77,67 +136,101 @@ class TaskResponse(BaseModel):
 
 # --- Core Logic ---
 
-async def process_task(task_id: str, email: str, secret: str, initial_url: str):
+async def process_task(task_id: str, email: str, secret: str, initial_url: str, deadline: Optional[Deadline] = None):
     """
     Main loop: Scrape -> Solve -> Submit -> Repeat if needed.
-    Updates global TASKS state.
+    Updates the task store through _log/_update_task so stream subscribers are woken up.
+    Every stage takes its timeout from `deadline`, which is counted from the /run request.
     """
-    TASKS[task_id]["status"] = "processing"
-    TASKS[task_id]["logs"].append(f"Started processing {initial_url}")
+    _update_task(task_id, status="processing")
+    _log(task_id, f"Started processing {initial_url}")
     
     # Global timeout enforcement
-    start_time = datetime.utcnow()
+    deadline = deadline or Deadline(TASK_DEADLINE_SECONDS)
     
     # Safety break to prevent infinite loops
     current_url = initial_url
     for step_idx in range(10): 
-        # Check global timeout
-        elapsed = (datetime.utcnow() - start_time).total_seconds()
-        if elapsed > 160: # Leave 20s buffer
-            msg = f"Global timeout approaching ({elapsed}s). Stopping."
+        # Not enough left to scrape, solve and still submit
+        if not deadline.allows(DEADLINE_SUBMIT_RESERVE_SECONDS * 2):
+            msg = f"Global timeout approaching ({deadline.remaining():.1f}s left). Stopping."
             logger.warning(msg)
-            TASKS[task_id]["logs"].append(msg)
-            TASKS[task_id]["status"] = "timeout"
+            _log(task_id, msg)
+            _update_task(task_id, status="timeout")
             break
 
         try:
             logger.info(f"[{task_id}] Processing URL: {current_url}")
-            TASKS[task_id]["logs"].append(f"Step {step_idx+1}: Navigating to {current_url}")
+            _log(task_id, f"Step {step_idx+1}: Navigating to {current_url}")
+            metrics.set_tags(step=step_idx + 1, attempt=None)
             
             # 1. Scrape the task
             try:
-                task_data = await scraper.get_task_from_url(current_url)
-                TASKS[task_id]["logs"].append(f"Scraped content (text_len={len(task_data.get('text', ''))})")
+                with metrics.span("scrape") as span:
+                    task_data = await scraper.get_task_from_url(current_url, deadline=deadline)
+                    span.outcome = task_data.get("tier", "ok")
+                    span.add(bytes_in=len(task_data.get("text", "")))
+                _log(task_id, f"Scraped content (text_len={len(task_data.get('text', ''))}, tier={task_data.get('tier')})")
+                structured = task_data.get("structured") or {}
+                if structured:
+                    _log(task_id, f"Structured: {len(structured['links'])} links, {len(structured['tables'])} tables, "
+                                  f"{len(structured['decoded'])} decoded payloads, {len(structured['audio'])} audio")
+                stats = task_data.get("image_stats", {})
+                if stats.get("skipped"):
+                    _log(task_id, "Screenshot skipped: DOM text is sufficient")
+                elif stats:
+                    _log(task_id, f"Screenshot: {len(task_data['images'])} tile(s), {stats['bytes']} bytes ({stats['saved_bytes']} saved)")
             except Exception as e:
                 msg = f"Scraping failed: {e}"
                 logger.error(msg)
-                TASKS[task_id]["logs"].append(msg)
-                TASKS[task_id]["status"] = "failed"
-                TASKS[task_id]["error"] = msg
+                _log(task_id, msg)
+                _update_task(task_id, status="failed", error=msg)
                 return
 
             # 2. Solve the task (with retries and model escalation)
             max_retries = 3
             feedback = None
+            alternatives = []
             
             for attempt in range(max_retries):
                 model = "gpt-4o" # Always use best model
+                metrics.set_tags(attempt=attempt + 1)
                 
-                logger.info(f"[{task_id}] Solving (attempt {attempt+1}/{max_retries})")
-                TASKS[task_id]["logs"].append(f"Solving attempt {attempt+1} with {model}")
+                if attempt and not deadline.allows(DEADLINE_SUBMIT_RESERVE_SECONDS):
+                    _log(task_id, f"Deadline reached ({deadline.remaining():.1f}s left), no further attempts")
+                    _update_task(task_id, status="timeout")
+                    return
                 
-                result = solver.solve(task_data, feedback, model=model)
+                if alternatives:
+                    # Runner-up from the last speculative vote: no new LLM round trip needed
+                    result = alternatives.pop(0)
+                    _log(task_id, f"Attempt {attempt+1}: trying runner-up answer")
+                else:
+                    logger.info(f"[{task_id}] Solving (attempt {attempt+1}/{max_retries})")
+                    _log(task_id, f"Solving attempt {attempt+1} with {model}")
+                    
+                    result = await solver.solve(task_data, feedback, model=model, candidates=SPECULATIVE_CANDIDATES, deadline=deadline)
+                    if isinstance(result, dict):
+                        alternatives = list(result.pop("alternatives", []))
+                        if "timings" in result:
+                            _log(task_id, f"Stage timings (s): {result.pop('timings')}")
+                        if "votes" in result:
+                            _log(task_id, f"Speculative vote: {result['votes']}/{result['candidates']} candidates agree")
+                        if result.get("cached"):
+                            _log(task_id, "Answer cache hit: verified program reproduced its answer, no LLM calls")
+                        if result.get("reused"):
+                            _log(task_id, "Program library hit: adapted a verified program, no LLM calls")
                 
                 if not isinstance(result, dict) or "answer" not in result or "submit_url" not in result:
                     msg = f"Invalid solver result: {result}"
                     logger.error(msg)
-                    TASKS[task_id]["logs"].append(msg)
+                    _log(task_id, msg)
                     feedback = f"Invalid JSON format. Output: {result}. Fix format."
                     continue
                     
                 answer = result["answer"]
                 submit_url = result["submit_url"]
-                TASKS[task_id]["logs"].append(f"Generated answer: {answer}")
+                _log(task_id, f"Generated answer: {answer}")
                 
                 # 3. Submit
                 payload = {
@@ -148,33 +241,45 @@ async def process_task(task_id: str, email: str, secret: str, initial_url: str):
                 }
                 
                 try:
-                    submission_response = await submit_result(submit_url, payload)
+                    # The reserve exists for this call, so it may use whatever is left
+                    with metrics.span("submit") as span:
+                        span.add(bytes_out=len(json.dumps(payload, default=str)))
+                        submission_response = await submit_result(submit_url, payload, timeout=deadline.timeout(10))
+                        span.outcome = "correct" if submission_response.get("correct") else "incorrect"
                     logger.info(f"[{task_id}] Submission response: {submission_response}")
-                    TASKS[task_id]["logs"].append(f"Submission result: {submission_response}")
+                    _log(task_id, f"Submission result: {submission_response}")
                 except Exception as e:
                     msg = f"Submission failed: {e}"
                     logger.error(msg)
-                    TASKS[task_id]["logs"].append(msg)
+                    _log(task_id, msg)
                     # If submission fails (network), maybe retry? For now, treat as error in logic
                     feedback = f"Submission failed: {e}"
                     continue
 
                 # 4. Handle Response
                 if submission_response.get("correct", False):
-                    TASKS[task_id]["logs"].append("Answer Correct!")
+                    _log(task_id, "Answer Correct!")
+                    if result.get("code"):
+                        answer_cache.store(*solver.cache_key_parts(task_data), result["code"], answer, submit_url)
+                        # Programs fed by vision output carry page-specific values that can't be re-parameterised
+                        if not task_data.get("visual_data"):
+                            program_library.store(*solver.library_key(task_data), result["code"], task_data.get("artifacts"))
                     next_url = submission_response.get("url")
                     if next_url:
                         current_url = next_url
-                        TASKS[task_id]["logs"].append(f"Next URL found: {next_url}")
+                        _log(task_id, f"Next URL found: {next_url}")
                         break # Break retry loop, continue outer loop
                     else:
-                        TASKS[task_id]["status"] = "completed"
-                        TASKS[task_id]["logs"].append("Quiz Completed Successfully.")
-                        TASKS[task_id]["result"] = "Success"
+                        _log(task_id, "Quiz Completed Successfully.")
+                        _update_task(task_id, status="completed", result="Success")
                         return # Exit function
                 else:
                     reason = submission_response.get("reason", "Unknown error")
-                    TASKS[task_id]["logs"].append(f"Answer Incorrect: {reason}")
+                    _log(task_id, f"Answer Incorrect: {reason}")
+                    if result.get("cached"):
+                        answer_cache.invalidate(*solver.cache_key_parts(task_data))
+                    if result.get("reused"):
+                        program_library.forget(solver.library_key(task_data)[0])
                     feedback = f"Incorrect. Server said: {reason}"
                     # Continue retry loop
             
@@ -182,49 +287,124 @@ async def process_task(task_id: str, email: str, secret: str, initial_url: str):
                 # Exhausted retries
                 msg = f"Failed to solve task at {current_url} after {max_retries} attempts."
                 logger.error(msg)
-                TASKS[task_id]["status"] = "failed"
-                TASKS[task_id]["error"] = msg
-                TASKS[task_id]["logs"].append(msg)
+                _log(task_id, msg)
+                _update_task(task_id, status="failed", error=msg)
                 break
 
         except Exception as e:
             logger.error(f"[{task_id}] Error in process loop: {e}")
-            TASKS[task_id]["status"] = "error"
-            TASKS[task_id]["error"] = str(e)
+            _update_task(task_id, status="error", error=str(e))
             break
 
 # --- Endpoints ---
 
+async def _run_queued(task_id: str, email: str, secret: str, url: str, enqueued_at: float, deadline: Deadline):
+    _log(task_id, f"Dequeued after {time.monotonic() - enqueued_at:.1f}s in queue ({deadline.remaining():.1f}s left)")
+    with metrics.tags(task_id=task_id):
+        await process_task(task_id, email, secret, url, deadline)
+
 @app.post("/run", response_model=TaskResponse)
-async def run_quiz(request: RunRequest, background_tasks: BackgroundTasks):
+async def run_quiz(request: RunRequest):
     # Verify secret
     user_secret = os.getenv("USER_SECRET", "default_secret")
     if request.secret != user_secret:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid secret")
     
-    task_id = str(uuid.uuid4())
-    TASKS[task_id] = {
-        "status": "queued",
-        "created_at": datetime.utcnow().isoformat(),
-        "logs": [],
-        "result": None,
-        "error": None
-    }
+    # Backpressure: refuse before creating a task that could never be scheduled
+    try:
+        task_scheduler.check_capacity(request.email)
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e), headers={"Retry-After": "10"})
+    
+    task_id = task_store.create_task(request.email, request.url)
+    task = task_store.get_task(task_id, include_logs=False)
     
-    # Start processing in background
-    background_tasks.add_task(process_task, task_id, request.email, request.secret, request.url)
+    # Queue for the worker pool; the deadline orders jobs across users and
+    # keeps running while the job waits, so queue time counts against the budget
+    now = time.monotonic()
+    deadline = Deadline(TASK_DEADLINE_SECONDS)
+    depth = task_scheduler.submit(
+        request.email,
+        lambda: _run_queued(task_id, request.email, request.secret, request.url, now, deadline),
+        deadline=deadline.expires_at
+    )
+    _log(task_id, f"Queued (queue depth {depth})")
     
     return {
         "task_id": task_id,
         "status": "queued",
-        "created_at": TASKS[task_id]["created_at"]
+        "created_at": task["created_at"]
     }
 
 @app.get("/tasks/{task_id}")
 async def get_task_status(task_id: str):
-    if task_id not in TASKS:
+    task = task_store.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return {
+        "status": task["status"],
+        "created_at": task["created_at"],
+        "logs": task["logs"],
+        "result": task["result"],
+        "error": task["error"]
+    }
+
+@app.get("/tasks/{task_id}/stream")
+async def stream_task(task_id: str, request: Request, offset: int = 0):
+    """
+    Server-Sent Events: pushes only new log lines ("log") and status transitions ("status"),
+    then "end" once the task is finished. Reconnecting clients resume via Last-Event-ID.
+    """
+    if not task_store.get_task(task_id, include_logs=False):
         raise HTTPException(status_code=404, detail="Task not found")
-    return TASKS[task_id]
+    last_event_id = request.headers.get("last-event-id")
+    sent = int(last_event_id) if last_event_id and last_event_id.isdigit() else max(0, offset)
+
+    async def events():
+        nonlocal sent
+        last_status = None
+        idle = 0.0
+        changed = None
+        try:
+            while True:
+                if changed is not None:
+                    task_events.unsubscribe(task_id)
+                changed = task_events.subscribe(task_id)
+                task = task_store.get_task(task_id, include_logs=False)
+                if task is None:
+                    return
+
+                for line in task_store.get_logs(task_id, offset=sent):
+                    sent += 1
+                    yield f"id: {sent}\nevent: log\ndata: {json.dumps(line)}\n\n"
+
+                if task["status"] != last_status:
+                    last_status = task["status"]
+                    payload = {"status": last_status, "result": task.get("result"), "error": task.get("error")}
+                    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+
+                if last_status in TERMINAL_STATUSES:
+                    yield "event: end\ndata: {}\n\n"
+                    return
+                if await request.is_disconnected():
+                    return
+                # Local changes wake us immediately; the short timeout picks up other workers' writes
+                if await task_events.wait(changed, timeout=2):
+                    idle = 0.0
+                else:
+                    idle += 2
+                    if idle >= 15:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+        finally:
+            if changed is not None:
+                task_events.unsubscribe(task_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/analyze")
 async def analyze_task_direct(request: AnalyzeRequest):
@@ -233,18 +413,27 @@ async def analyze_task_direct(request: AnalyzeRequest):
     """
     try:
         task_data = {"text": request.text, "screenshot": request.screenshot}
-        result = solver.solve(task_data, model=request.model)
+        result = await solver.solve(task_data, model=request.model)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.on_event("startup")
 async def startup():
+    await task_store.start()
+    await task_scheduler.start()
     await scraper.start()
+    await sandbox_pool.start()
+    await http_client.start()
 
 @app.on_event("shutdown")
 async def shutdown():
+    await task_scheduler.stop()
     await scraper.stop()
+    await sandbox_pool.stop()
+    await http_client.stop()
+    await llm_client.close()
+    await task_store.stop()
 
 if __name__ == "__main__":
     uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,49 @@
+import asyncio
+
+from app.services.answer_cache import AnswerCache, normalize_text
+from core import solver as solver_module
+from core.solver import TaskSolver
+
+def test_normalization_ignores_student_specifics():
+    a = "Q834. Email: alice@uni.edu\n  Download https://q.test/data?email=alice@uni.edu&id=7"
+    b = "q834. email: BOB@uni.edu download https://q.test/data?email=bob%40uni.edu&id=9"
+    assert normalize_text(a) == normalize_text(b)
+    assert normalize_text("sum is 10") != normalize_text("sum is 11")
+
+def test_entries_are_keyed_on_text_and_artifacts(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.sqlite3"), ttl=60)
+    assert not cache.known("What is the total?")
+
+    cache.store("What is the total?", ["sha-b", "sha-a"], "print(1)", 15, "https://q.test/submit")
+    assert cache.known("what is  the total?")
+    assert cache.get("What is the total?", ["sha-a", "sha-b"]) == {
+        "code": "print(1)", "answer": 15, "submit_url": "https://q.test/submit"
+    }
+    assert cache.get("What is the total?", ["sha-c"]) is None  # same page, different data file
+
+    cache.invalidate("What is the total?", ["sha-a", "sha-b"])
+    assert not cache.known("What is the total?")
+    assert cache.snapshot()["invalidated"] == 1
+
+def test_failed_rerun_keeps_the_entry(tmp_path, monkeypatch):
+    cache = AnswerCache(path=str(tmp_path / "answers.sqlite3"), ttl=60)
+    monkeypatch.setattr(solver_module, "answer_cache", cache)
+    cache.store("What is the total?", [], "print(15)", 15, "https://q.test/submit")
+    task = {"text": "What is the total?", "artifacts": {}}
+
+    async def timed_out(self, code, timeout=60, tables=None):
+        raise Exception("Execution error: Execution timed out after 60s")
+
+    async def different(self, code, timeout=60, tables=None):
+        return '{"answer": 16}'
+
+    monkeypatch.setattr(TaskSolver, "execute_code", timed_out)
+    assert asyncio.run(TaskSolver()._solve_from_cache(dict(task), None, {})) is None
+    assert cache.known("What is the total?")
+
+    monkeypatch.setattr(TaskSolver, "execute_code", different)
+    assert asyncio.run(TaskSolver()._solve_from_cache(dict(task), None, {})) is None
+    assert not cache.known("What is the total?")
+    assert asyncio.run(TaskSolver()._solve_from_cache(dict(task), None, {})) is None
+    assert cache.snapshot()["misses"] == 3
+    assert cache.snapshot()["invalidated"] == 1
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+
+from app.services import artifact_cache as artifact_module
+from app.services.artifact_cache import ArtifactCache
+from app.services.http_client import HTTPClient
+
+def _serve(monkeypatch, handler):
+    client = HTTPClient(transport=httpx.MockTransport(handler), backoff=0)
+    monkeypatch.setattr(artifact_module, "http_client", client)
+    return client
+
+def test_revalidates_with_etag_and_dedupes_content(tmp_path, monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append((request.url.path, request.headers.get("if-none-match")))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"a,b\n1,2\n", headers={"ETag": '"v1"'})
+
+    client = _serve(monkeypatch, handler)
+    cache = ArtifactCache(root=str(tmp_path), max_bytes=1024, fresh_seconds=0)
+
+    async def scenario():
+        first = await cache.fetch("http://quiz.test/data.csv")
+        again = await cache.fetch("http://quiz.test/data.csv")
+        mirror = await cache.fetch("http://mirror.test/copy.csv")
+        await client.stop()
+        return first, again, mirror
+
+    first, again, mirror = asyncio.run(scenario())
+    assert not first["cached"] and again["cached"]
+    assert seen[1] == ("/data.csv", '"v1"')
+    assert first["path"] == mirror["path"]  # same bytes, one file
+    assert first["path"].endswith(".csv")
+    assert cache.snapshot()["revalidated"] == 1
+
+def test_lru_eviction_and_concurrent_fetches(tmp_path, monkeypatch):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, content=request.url.path.encode() * 40)
+
+    client = _serve(monkeypatch, handler)
+    cache = ArtifactCache(root=str(tmp_path), max_bytes=500, fresh_seconds=3600)
+
+    async def scenario():
+        paths = await cache.prefetch(["http://q.test/a.csv"] * 3 + ["http://q.test/b.csv"])
+        await asyncio.gather(*(cache.fetch("http://q.test/a.csv") for _ in range(3)))
+        await cache.fetch("http://q.test/a.csv")  # a becomes most recently used
+        await cache.fetch("http://q.test/c.csv")
+        await client.stop()
+        return paths
+
+    paths = asyncio.run(scenario())
+    assert calls.count("/a.csv") == 1
+    assert set(paths) == {"http://q.test/a.csv", "http://q.test/b.csv"}
+    assert cache.snapshot()["evictions"] == 1
+    assert cache._entry("http://q.test/b.csv") is None
+    assert not cache._url_locks  # per-URL locks are dropped once their fetches finish
+    assert cache._entry("http://q.test/a.csv") is not None
+
+def test_background_prefetch_parses_tables(tmp_path, monkeypatch):
+    import pandas as pd
+
+    from app.services.artifact_cache import describe_artifacts
+
+    def handler(request):
+        return httpx.Response(200, content=b"city,sales\nPune,10\nGoa,5\n")
+
+    client = _serve(monkeypatch, handler)
+    cache = ArtifactCache(root=str(tmp_path), max_bytes=1 << 20, fresh_seconds=3600)
+
+    async def scenario():
+        task = cache.start_prefetch([
+            {"url": "http://q.test/data.csv", "kind": "data"},
+            {"url": "http://q.test/next", "kind": "page"},
+        ])
+        artifacts = await task
+        await client.stop()
+        return artifacts
+
+    artifacts = asyncio.run(scenario())
+    assert list(artifacts) == ["http://q.test/data.csv"]
+    table = artifacts["http://q.test/data.csv"]["table"]
+    frame = pd.read_parquet(table) if table.endswith(".parquet") else pd.read_pickle(table)
+    assert frame["sales"].sum() == 15
+    assert "already parsed" in describe_artifacts(artifacts)
+
+def test_sandbox_scripts_load_prepared_tables(tmp_path):
+    from app.services.sandbox_worker import run_script
+    from app.utils.tables import convert_table
+
+    source = tmp_path / "data.csv"
+    source.write_text("city,sales\nPune,10\nGoa,5\n")
+    tables = {"http://q.test/files/data.csv": convert_table(str(source))}
+    code = (
+        "df = load_table('data.csv')\n"
+        "df['sales'] = 0  # must not leak into the next run\n"
+        "print(load_table('http://q.test/files/data.csv')['sales'].sum())"
+    )
+
+    assert run_script(code, tables=tables)["stdout"].strip() == "15"
+    assert run_script(code, tables=tables)["stdout"].strip() == "15"
+    assert "No prepared table" in run_script("load_table('other.csv')", tables=tables)["stderr"]
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.handlers.browser_handler import BrowserHandler
+
+class FakePage:
+    def __init__(self, missing=(), shown=""):
+        self.missing = set(missing)
+        self.shown = shown
+        self.calls = []
+
+    async def fill(self, selector, value, timeout=None):
+        self.calls.append(("fill", selector, value))
+
+    async def click(self, selector, timeout=None):
+        if selector in self.missing:
+            raise Exception(f"Timeout waiting for {selector}\nCall log: ...")
+        self.calls.append(("click", selector))
+
+    async def wait_for_function(self, expression, *, arg=None, timeout=None, polling=None):
+        # Same signature as Playwright's: `arg` is keyword-only
+        selector, text = arg
+        if text not in self.shown:
+            raise Exception("Timeout")
+
+    async def evaluate(self, script, args=None):
+        return None
+
+def test_plan_runs_back_to_back_and_stops_at_first_failure():
+    page = FakePage(missing={"#next"})
+    plan = [
+        {"type": "type", "selector": "#name", "value": "Ada"},
+        {"type": "type", "selector": "#year", "value": 1815},
+        {"type": "click", "selector": "#next"},
+        {"type": "click", "selector": "#submit"},
+    ]
+    executed, failure = asyncio.run(BrowserHandler()._run_plan(page, plan))
+    assert executed == 2
+    assert failure == "action 3 (click #next): Timeout waiting for #next"
+    assert page.calls == [("fill", "#name", "Ada"), ("fill", "#year", "1815")]
+
+def test_unmet_post_condition_stops_the_plan():
+    page = FakePage()
+    plan = [
+        {"type": "click", "selector": "#submit", "expect": {"text": "Thanks"}},
+        {"type": "click", "selector": "#again"},
+    ]
+    executed, failure = asyncio.run(BrowserHandler()._run_plan(page, plan))
+    assert executed == 0
+    assert "expected page to show 'Thanks'" in failure
+    assert page.calls == [("click", "#submit")]
+
+def test_met_post_condition_continues_the_plan():
+    page = FakePage(shown="Thanks for submitting")
+    plan = [
+        {"type": "click", "selector": "#submit", "expect": {"text": "Thanks"}},
+        {"type": "click", "selector": "#again"},
+    ]
+    executed, failure = asyncio.run(BrowserHandler()._run_plan(page, plan))
+    assert (executed, failure) == (2, None)
+    assert page.calls == [("click", "#submit"), ("click", "#again")]
@@ -0,0 +1,96 @@
+import asyncio
+
+from app.services.browser_pool import BrowserPool
+
+class FakeFrame:
+    def __init__(self, url):
+        self.url = url
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+        self.listeners = {}
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+    def remove_listener(self, event, handler):
+        self.listeners.pop(event, None)
+
+    def is_closed(self):
+        return self.closed
+
+    async def evaluate(self, script):
+        return 1
+
+    async def goto(self, url):
+        self.listeners["framenavigated"](FakeFrame(url))
+
+    async def close(self):
+        self.closed = True
+
+class FakeCDP:
+    def __init__(self, cleared):
+        self.cleared = cleared
+
+    async def send(self, method, params):
+        self.cleared.append(params["origin"])
+
+    async def detach(self):
+        pass
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+        self.cookies_cleared = 0
+        self.cleared_origins = []
+
+    async def new_page(self):
+        return FakePage()
+
+    async def clear_cookies(self):
+        self.cookies_cleared += 1
+
+    async def new_cdp_session(self, page):
+        return FakeCDP(self.cleared_origins)
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+def make_pool():
+    pool = BrowserPool(size=1, max_uses=10)
+    pool._browser = FakeBrowser()
+    pool._idle = asyncio.Queue()
+    context = FakeContext()
+    pool._idle.put_nowait({"context": context, "page": FakePage(), "uses": 0, "broken": False})
+    return pool, context
+
+def test_release_gives_a_fresh_page_and_clears_visited_origins():
+    async def run():
+        pool, context = make_pool()
+        async with pool.page() as page:
+            await page.goto("https://quiz.test/q1")
+            await page.goto("about:blank")
+        async with pool.page() as second:
+            assert second is not page and page.closed
+        return context
+
+    context = asyncio.run(run())
+    assert context.cleared_origins == ["https://quiz.test"]
+    assert context.cookies_cleared == 2
+
+def test_slot_checked_out_during_stop_is_closed_on_release():
+    async def run():
+        pool, context = make_pool()
+        async with pool.page():
+            await pool.stop()
+        return context
+
+    assert asyncio.run(run()).closed
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.utils.deadline import Deadline
+from core.solver import TaskSolver
+
+def test_sub_timeouts_shrink_to_remaining_budget():
+    deadline = Deadline(30)
+    assert deadline.timeout(10) == 10
+    assert 19 < deadline.timeout(60, reserve=10) <= 20
+    assert deadline.allows(25) and not deadline.allows(31)
+
+    spent = Deadline(0)
+    assert spent.expired()
+    assert spent.timeout(10, reserve=5) == 0.5  # never hand out a zero/negative timeout
+
+def test_speculative_vote_uses_finished_candidates_at_deadline(monkeypatch):
+    delays = iter([0, 0, 30])
+
+    async def fake_candidate(self, analysis, visual_data, feedback, temperature, hint, timings, deadline, artifacts=None):
+        await asyncio.sleep(next(delays))
+        return {"answer": 42, "submit_url": "http://example.com/submit"}
+
+    monkeypatch.setattr(TaskSolver, "_run_candidate", fake_candidate)
+    monkeypatch.setattr("core.solver.DEADLINE_SUBMIT_RESERVE_SECONDS", 0)
+
+    async def scenario():
+        return await TaskSolver().solve_speculative({}, candidates=3, deadline=Deadline(0.6))
+
+    best = asyncio.run(scenario())
+    assert best["answer"] == 42
+    assert best["votes"] == 2
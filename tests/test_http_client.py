@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.http_client import HTTPClient
+
+def _client(handler, **kwargs):
+    return HTTPClient(transport=httpx.MockTransport(handler), backoff=0, **kwargs)
+
+def test_get_is_retried_until_success():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(503 if len(calls) < 3 else 200, json={"ok": True})
+
+    async def scenario():
+        client = _client(handler, retries=3)
+        await client.start()
+        response = await client.get("http://quiz.test/data.csv")
+        await client.stop()
+        return response, client.stats
+
+    response, stats = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert stats["retries"] == 2
+
+def test_post_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        client = _client(handler, retries=3)
+        await client.start()
+        try:
+            await client.post("http://quiz.test/submit", json={"answer": 1})
+        finally:
+            await client.stop()
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(scenario())
+    assert calls == ["POST"]
+
+def test_connections_per_host_are_bounded():
+    in_flight = {"now": 0, "peak": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return httpx.Response(200)
+
+    async def scenario():
+        client = _client(handler, max_per_host=2)
+        await client.start()
+        await asyncio.gather(*(client.get("http://quiz.test/file") for _ in range(6)))
+        await client.stop()
+
+    asyncio.run(scenario())
+    assert in_flight["peak"] == 2
+
+def test_download_streams_to_disk(tmp_path):
+    body = b"x" * (256 * 1024 + 7)
+
+    def handler(request):
+        return httpx.Response(200, content=body)
+
+    async def scenario():
+        client = _client(handler)
+        await client.start()
+        download = await client.download("http://quiz.test/audio.mp3", str(tmp_path / "a.mp3"), chunk_size=4096)
+        await client.stop()
+        return download["bytes"]
+
+    assert asyncio.run(scenario()) == len(body)
+    assert (tmp_path / "a.mp3").read_bytes() == body
@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+from app.utils.image_prep import image_parts, prepare_image, text_is_sufficient
+
+def test_text_only_pages_skip_the_screenshot():
+    assert text_is_sufficient("Q: sum the column. " * 20, visual_elements=0)
+    assert not text_is_sufficient("Q: sum the column. " * 20, visual_elements=1)
+    assert not text_is_sufficient("Loading...", visual_elements=0)
+
+def test_image_parts_accepts_prepared_tiles_and_raw_screenshots():
+    tiles = image_parts({"images": ["data:image/webp;base64,AAA", "data:image/webp;base64,BBB"]})
+    assert [p["image_url"]["url"] for p in tiles] == ["data:image/webp;base64,AAA", "data:image/webp;base64,BBB"]
+    raw = image_parts({"screenshot": "CCC"})
+    assert raw[0]["image_url"]["url"] == "data:image/png;base64,CCC"
+    assert image_parts({"text": "only text"}) == []
+
+def test_tall_screenshot_is_downscaled_tiled_and_smaller():
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (2048, 5000), "white").save(buffer, format="PNG")
+    png = buffer.getvalue()
+
+    prepared = prepare_image(png, fmt="jpeg", max_width=1024, tile_height=1000, max_tiles=2)
+    assert len(prepared["images"]) == 2
+    assert prepared["images"][0].startswith("data:image/jpeg;base64,")
+    assert prepared["saved_bytes"] == len(png) - prepared["bytes"]
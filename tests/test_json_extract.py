@@ -0,0 +1,44 @@
+import json
+import time
+
+from app.services.sandbox_worker import run_script
+from app.utils.json_extract import extract_json
+
+def test_last_object_with_answer_wins():
+    output = 'loading {"debug": 1}\n{"answer": 1}\nrows: {"n": 3}\n{"answer": 42, "submit_url": "http://q/submit"}\ndone'
+    assert extract_json(output) == {"answer": 42, "submit_url": "http://q/submit"}
+
+def test_nested_and_braces_inside_strings():
+    assert extract_json('x {"answer": {"a": [1, {"b": 2}]}} y') == {"answer": {"a": [1, {"b": 2}]}}
+    assert extract_json('log } stray\n{"answer": "a}b", "submit_url": "u"}') == {"answer": "a}b", "submit_url": "u"}
+
+def test_last_answer_wins_even_when_output_is_all_json():
+    output = '{"answer": "draft"}\n{"answer": 42, "submit_url": "u"}'
+    assert extract_json(output) == {"answer": 42, "submit_url": "u"}
+
+def test_debug_objects_after_the_answer_are_free():
+    rows = "\n".join(json.dumps({"row": i}) for i in range(100))
+    assert extract_json('log\n{"answer": 7}\n' + rows) == {"answer": 7}
+
+def test_invalid_spans_are_skipped():
+    assert extract_json("{not json} {'answer': 1}") is None
+    assert extract_json('{"answer": 1} then {broken') == {"answer": 1}
+    assert extract_json("") is None
+
+def test_large_output_is_linear():
+    noise = "\n".join(json.dumps({"row": i, "values": list(range(5))}) for i in range(20000))
+    output = 'log\n{"answer": 7}\n' + noise
+    start = time.perf_counter()
+    assert extract_json(output) == {"answer": 7}
+    assert time.perf_counter() - start < 2
+
+def test_unbalanced_braces_are_linear():
+    start = time.perf_counter()
+    assert extract_json("}" * 100000) is None
+    assert extract_json("{" + "}" * 100000) is None
+    assert time.perf_counter() - start < 2
+
+def test_sandbox_output_keeps_the_tail():
+    result = run_script('print("x" * 5000)\nprint(\'{"answer": 1}\')', max_output=100)
+    assert result["stdout"].startswith("[... ")
+    assert extract_json(result["stdout"]) == {"answer": 1}
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from app.services.llm_cache import LLMCache
+
+def test_key_is_stable_and_content_addressed():
+    messages = [{"role": "user", "content": [{"type": "text", "text": "hi"}]}]
+    key = LLMCache.make_key("gpt-4o", messages, response_format=None)
+    assert key == LLMCache.make_key("gpt-4o", [dict(m) for m in messages], response_format=None)
+    assert key != LLMCache.make_key("gpt-4o-mini", messages, response_format=None)
+    assert len(key) == 64
+
+def test_memory_tier_evicts_lru_within_byte_budget():
+    cache = LLMCache(path=None, max_bytes=10, ttl=60)
+    cache.set("a", "12345")
+    cache.set("b", "12345")
+    cache.get("a")  # "b" becomes least recently used
+    cache.set("c", "12345")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    assert cache.snapshot()["evictions"] == 1
+    assert cache.snapshot()["bytes"] <= 10
+
+def test_ttl_expiry():
+    cache = LLMCache(path=None, max_bytes=1024, ttl=0)
+    cache.set("a", "value")
+    time.sleep(0.01)
+    assert cache.get("a") is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    LLMCache(path=path, max_bytes=1024, ttl=60).set("k", "persisted")
+
+    cache = LLMCache(path=path, max_bytes=1024, ttl=60)
+    assert cache.get("k") == "persisted"
+    assert cache.stats["disk_hits"] == 1
+    assert cache.get("k") == "persisted"
+    assert cache.stats["hits"] == 1
+
+def test_async_tiers_round_trip_through_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def scenario():
+        await LLMCache(path=path, max_bytes=1024, ttl=60).aset("k", "persisted")
+        cache = LLMCache(path=path, max_bytes=1024, ttl=60)
+        return cache, await cache.aget("k"), await cache.aget("missing")
+
+    cache, value, missing = asyncio.run(scenario())
+    assert (value, missing) == ("persisted", None)
+    assert cache.stats["disk_hits"] == 1 and cache.stats["misses"] == 1
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+from app.services.metrics import Metrics
+
+def test_spans_aggregate_into_prometheus_histograms():
+    metrics = Metrics(buckets=(0.1, 1))
+    with metrics.tags(task_id="t1"):
+        metrics.set_tags(step=1)
+        with metrics.span("codegen") as span:
+            assert span.tags == {"task_id": "t1", "step": 1}
+            span.model = "gpt-4o"
+            metrics.add(tokens_in=1200, tokens_out=300, cost=0.006)
+        with pytest.raises(RuntimeError):
+            with metrics.span("execute"):
+                raise RuntimeError("boom")
+    with metrics.span("submit") as span:
+        assert span.tags == {}  # tags end with their block
+        span.outcome = "correct"
+
+    text = metrics.render()
+    assert 'quiz_stage_duration_seconds_bucket{stage="codegen",model="gpt-4o",outcome="ok",le="0.1"} 1' in text
+    assert 'quiz_stage_duration_seconds_count{stage="execute",model="",outcome="error"} 1' in text
+    assert 'quiz_stage_tokens_total{stage="codegen",model="gpt-4o",outcome="ok",direction="in"} 1200' in text
+    assert 'quiz_stage_cost_usd_total{stage="codegen",model="gpt-4o",outcome="ok"} 0.006000' in text
+    assert 'quiz_stage_duration_seconds_count{stage="submit",model="",outcome="correct"} 1' in text
+
+def test_tags_follow_spawned_tasks_and_collectors_become_gauges():
+    metrics = Metrics()
+    metrics.add_collector("cache", lambda: {"hits": 3, "enabled": True, "path": "/tmp/x"})
+    seen = []
+
+    async def child():
+        with metrics.span("vision") as span:
+            seen.append(span.tags)
+
+    async def scenario():
+        with metrics.tags(task_id="t2", attempt=2):
+            await asyncio.create_task(child())
+
+    asyncio.run(scenario())
+    assert seen == [{"task_id": "t2", "attempt": 2}]
+    text = metrics.render()
+    assert "quiz_cache_hits 3" in text
+    assert "enabled" not in text and "path" not in text
+
+def test_span_lines_carry_task_tags_at_info(caplog):
+    metrics = Metrics()
+    with caplog.at_level(logging.INFO, logger="spans"):
+        with metrics.tags(task_id="t9", step=2, attempt=1):
+            with metrics.span("execute"):
+                pass
+    record = json.loads([r for r in caplog.records if r.name == "spans"][-1].getMessage())
+    assert record["stage"] == "execute"
+    assert (record["task_id"], record["step"], record["attempt"]) == ("t9", 2, 1)
@@ -0,0 +1,54 @@
+import base64
+
+from app.utils.page_extract import classify, extract_page, script_status, summarize, visual_element_count
+
+PAYLOAD = base64.b64encode(
+    b'<p>Download <a href="/files/data.csv">this file</a>. Post your answer to https://quiz.test/submit</p>'
+).decode()
+
+HTML = f"""
+<html><body>
+  <h1>Q834</h1>
+  <div id="result"></div>
+  <script>document.querySelector("#result").innerHTML = atob(`{PAYLOAD}`);</script>
+  <table><tr><th>city</th><th>sales</th></tr><tr><td>Pune</td><td>10</td></tr></table>
+  <audio src="clip.mp3"></audio>
+  <img src="/chart.png">
+</body></html>
+"""
+
+def test_single_pass_extraction():
+    page = extract_page(HTML, "https://quiz.test/q834")
+
+    assert page["decoded"][0].startswith("<p>Download")
+    kinds = {link["url"]: link["kind"] for link in page["links"]}
+    assert kinds["https://quiz.test/files/data.csv"] == "data"
+    assert page["submit_urls"] == ["https://quiz.test/submit"]
+    assert page["tables"] == [{"headers": ["city", "sales"], "rows": [["Pune", "10"]]}]
+    assert page["audio"] == ["https://quiz.test/clip.mp3"]
+    assert page["images"] == ["https://quiz.test/chart.png"]
+    assert "Q834" in page["text"] and "Download" in page["text"]
+    assert classify(page) == "audio"
+
+def test_rendered_dom_does_not_duplicate_decoded_text():
+    decoded = base64.b64decode(PAYLOAD).decode()
+    rendered = HTML.replace('<div id="result"></div>', f'<div id="result">{decoded}</div>')
+    page = extract_page(rendered, "https://quiz.test/q834")
+    assert page["text"].count("Download") == 1
+
+def test_summary_lists_structure():
+    page = extract_page("<p>Sum the sales</p><a href='a.pdf'>report</a>", "https://quiz.test/")
+    assert classify(page) == "data"
+    assert "- [pdf] https://quiz.test/a.pdf report" in summarize(page)
+
+def test_script_status_decides_whether_a_browser_is_needed():
+    assert script_status("<p>Sum the sales</p>") == "none"
+    assert script_status(HTML) == "resolvable"
+    assert script_status('<script>document.write(atob("UTE="));</script>') == "resolvable"
+    assert script_status('<script>fetch("/task").then(r => r.text())</script>') == "dynamic"
+    # extract_page only decodes atob() payloads, so literal writes still need a render
+    assert script_status('<script>document.write("<p>Q1</p>")</script>') == "dynamic"
+    tracker = '<script src="https://www.googletagmanager.com/gtag.js"></script>'
+    assert script_status(tracker) == "dynamic"
+    assert script_status(tracker, ignore_src=lambda src: "googletagmanager" in src) == "none"
+    assert visual_element_count(HTML) == 1
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.utils.image_prep import visual_distance
+from app.utils.page_observe import describe_diff, diff_outline, settle
+
+def test_outline_diff_lists_only_changes():
+    before = ['h1 "Quiz"', 'input#q type=text value=""', 'button#go "Go"']
+    after = ['h1 "Quiz"', 'input#q type=text value="42"', 'button#go "Go"', 'div#result "Correct"']
+    diff = diff_outline(before, after)
+    assert diff == {
+        "added": ['input#q type=text value="42"', 'div#result "Correct"'],
+        "removed": ['input#q type=text value=""'],
+    }
+    assert describe_diff(diff_outline(before, before)) == "Page elements: no change."
+    assert '+ div#result "Correct"' in describe_diff(diff)
+
+def test_visual_distance_counts_differing_bits():
+    assert visual_distance("00000000000000ff", "00000000000000ff") == 0
+    assert visual_distance("00000000000000ff", "000000000000000f") == 4
+    assert visual_distance(None, "00000000000000ff") == 64  # first screenshot always counts as changed
+
+def test_settle_follows_navigation_and_waits_for_network():
+    class FakePage:
+        def __init__(self):
+            self.evaluations = 0
+
+        async def evaluate(self, script, args):
+            self.evaluations += 1
+            if self.evaluations == 1:
+                raise Exception("Execution context was destroyed")
+            tracker.inflight = 0 if self.evaluations > 2 else 1
+
+        async def wait_for_load_state(self, state, timeout=None):
+            pass
+
+    class Tracker:
+        inflight = 1
+
+    tracker = Tracker()
+    page = FakePage()
+    waited = asyncio.run(settle(page, tracker, quiet_ms=10, timeout_ms=1000))
+    assert page.evaluations == 3
+    assert waited < 1
@@ -0,0 +1,47 @@
+from app.services.program_library import ProgramLibrary, parameterize, template
+
+def test_same_template_with_different_values_shares_a_signature():
+    sig_a, slots_a = template("Sum the values above 10 in the file.", ["https://q.test/files/a.csv"])
+    sig_b, slots_b = template("Sum the values above 25 in the file.", ["https://q.test/files/b.csv"])
+    assert sig_a == sig_b
+    assert slots_a == ["10", "https://q.test/files/a.csv"]
+    assert slots_b == ["25", "https://q.test/files/b.csv"]
+    assert template("Count the values above 10.")[0] != sig_a
+
+def test_parameterize_rewrites_literals_only():
+    code = (
+        "import pandas as pd\n"
+        "df = pd.read_csv('https://q.test/files/a.csv')  # threshold 10\n"
+        "x10 = 10\n"
+        "print({'answer': int(df[df.v > x10].v.sum())})\n"
+    )
+    adapted = parameterize(code, ["10", "https://q.test/files/a.csv"], ["25", "https://q.test/files/b.csv"])
+    assert "read_csv('https://q.test/files/b.csv')" in adapted
+    assert "x10 = 25" in adapted
+    assert "# threshold 10" in adapted  # comments and identifiers untouched
+
+    # 10 can't map to both 25 and 30
+    assert parameterize(code, ["10", "10"], ["25", "30"]) is None
+
+def test_parameterize_refuses_numbers_the_code_may_own():
+    slots = (["2"], ["3"])
+    assert parameterize("limit = 2\nprint(df[df.v > 2].v.sum())", *slots) is None  # twice
+    assert parameterize("print(round(df.v.mean(), 2))", *slots) is None
+    assert parameterize("print(df.head(2))", *slots) is None
+    assert parameterize("print(df.sum(axis=2))", *slots) is None
+    assert parameterize("print(rows[2])", *slots) is None
+    assert parameterize("print(df[df.v > 2].v.sum())", *slots) == "print(df[df.v > 3].v.sum())"
+    assert parameterize("limit = 2\nprint(round(x, 4))", *slots) == "limit = 3\nprint(round(x, 4))"
+
+def test_library_maps_local_paths_through_urls(tmp_path):
+    library = ProgramLibrary(path=str(tmp_path / "programs.sqlite3"), ttl=60)
+    signature, slots = template("Total above 10", ["https://q.test/a.csv"])
+    code = "df = load('/cache/objects/aa/old.csv')\nprint(df[df.v > 10].v.sum())"
+    library.store(signature, slots, code, {"https://q.test/a.csv": {"path": "/cache/objects/aa/old.csv"}})
+
+    new_signature, new_slots = template("Total above 12", ["https://q.test/b.csv"])
+    entry = library.get(new_signature)
+    assert entry is not None
+    assert library.adapt(entry, new_slots, {}) is None  # new file not downloaded yet
+    adapted = library.adapt(entry, new_slots, {"https://q.test/b.csv": {"path": "/cache/objects/bb/new.csv"}})
+    assert adapted == "df = load('/cache/objects/bb/new.csv')\nprint(df[df.v > 12].v.sum())"
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.services.request_router import RequestRouter
+
+class FakeFrame:
+    url = "https://quiz.test/q1"
+
+class FakeRequest:
+    def __init__(self, url, resource_type, method="GET"):
+        self.url, self.resource_type, self.method = url, resource_type, method
+        self.frame = FakeFrame()
+
+class FakeResponse:
+    status = 200
+    headers = {"content-type": "text/css", "set-cookie": "a=1"}
+
+    async def body(self):
+        return b"body { color: red }"
+
+class FakeRoute:
+    def __init__(self):
+        self.outcome = None
+
+    async def abort(self, reason):
+        self.outcome = ("abort", reason)
+
+    async def continue_(self):
+        self.outcome = ("continue",)
+
+    async def fetch(self):
+        return FakeResponse()
+
+    async def fulfill(self, response=None, status=None, headers=None, body=None):
+        self.outcome = ("fulfill", "network" if response else "cache", headers, body)
+
+def route(router, url, resource_type):
+    fake = FakeRoute()
+    asyncio.run(router.handle(fake, FakeRequest(url, resource_type)))
+    return fake.outcome
+
+def test_blocks_resource_types_and_tracker_domains():
+    router = RequestRouter(block_types={"font"}, block_domains=["google-analytics.com"], cache_types=set())
+    assert route(router, "https://quiz.test/f.woff2", "font") == ("abort", "blockedbyclient")
+    assert route(router, "https://www.google-analytics.com/collect", "xhr") == ("abort", "blockedbyclient")
+    assert route(router, "https://quiz.test/data.json", "fetch") == ("continue",)
+    assert router.stats["blocked"] == 2
+
+def test_static_assets_are_served_from_cache_after_first_fetch():
+    router = RequestRouter(block_types=set(), block_domains=[], cache_types={"stylesheet", "script"}, max_bytes=1024, ttl=60)
+    first = route(router, "https://cdn.test/site.css", "stylesheet")
+    second = route(router, "https://cdn.test/site.css", "stylesheet")
+    assert first[:2] == ("fulfill", "network")
+    assert second == ("fulfill", "cache", {"content-type": "text/css"}, b"body { color: red }")
+
+    # Same-origin scripts can build the quiz, so they always go to the network
+    assert route(router, "https://quiz.test/app.js", "script") == ("continue",)
+    assert route(router, "https://cdn.test/lib.js", "script")[:2] == ("fulfill", "network")
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+from app.services.sandbox_worker import run_forked
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="jobs only run isolated where fork exists")
+def test_jobs_do_not_leak_state_into_the_next_one():
+    first = run_forked({"code": "import os, json\nos.environ['SANDBOX_LEAK'] = '1'\njson.dumps = None\nprint('ok')"})
+    assert first["stdout"] == "ok\n"
+    second = run_forked({"code": "import os, json\nprint(os.environ.get('SANDBOX_LEAK'), json.dumps(1))"})
+    assert second["stdout"] == "None 1\n"
+    assert "SANDBOX_LEAK" not in os.environ
+
+def test_a_killed_job_is_reported():
+    result = run_forked({"code": "import os, signal\nos.kill(os.getpid(), signal.SIGKILL)"})
+    assert result["returncode"] == -1 and "died" in result["stderr"]
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from app.services.scheduler import TaskScheduler, QueueFullError
+
+def test_lanes_are_served_round_robin():
+    async def scenario():
+        scheduler = TaskScheduler(workers=1, max_queue=10, max_per_email=10)
+        gate = asyncio.Event()
+        order = []
+
+        async def blocker():
+            await gate.wait()
+
+        def job(name):
+            async def run():
+                order.append(name)
+            return run
+
+        await scheduler.start()
+        scheduler.submit("busy", blocker, deadline=0)
+        await asyncio.sleep(0)  # the only worker is now blocked
+
+        # "a" floods the queue, "b" arrives later with one job; deadlines follow arrival
+        scheduler.submit("a", job("a1"), deadline=10)
+        scheduler.submit("a", job("a2"), deadline=11)
+        scheduler.submit("a", job("a3"), deadline=12)
+        scheduler.submit("b", job("b1"), deadline=13)
+
+        gate.set()
+        while scheduler.snapshot()["depth"] or scheduler.snapshot()["busy"]:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        return order
+
+    assert asyncio.run(scenario()) == ["a1", "b1", "a2", "a3"]
+
+def test_backpressure_when_full():
+    async def scenario():
+        scheduler = TaskScheduler(workers=1, max_queue=2, max_per_email=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        await scheduler.start()
+        scheduler.submit("x", blocker, deadline=0)
+        await asyncio.sleep(0)
+
+        scheduler.submit("x", blocker, deadline=1)
+        with pytest.raises(QueueFullError):
+            scheduler.submit("x", blocker, deadline=1)  # per-email limit
+        scheduler.submit("y", blocker, deadline=1)
+        with pytest.raises(QueueFullError):
+            scheduler.submit("z", blocker, deadline=1)  # global limit
+
+        snapshot = scheduler.snapshot()
+        gate.set()
+        await scheduler.stop()
+        return snapshot
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["depth"] == 2
+    assert snapshot["rejected"] == 2
+    assert snapshot["busy"] == 1
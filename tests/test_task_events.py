@@ -0,0 +1,20 @@
+from app.services.task_events import TaskEvents
+
+def test_finished_subscriptions_leave_no_entry():
+    events = TaskEvents()
+    first = events.subscribe("t1")
+    second = events.subscribe("t1")
+    assert first is second
+
+    events.unsubscribe("t1")
+    assert "t1" in events._events
+    events.unsubscribe("t1")
+    assert not events._events and not events._subscribers
+
+def test_notify_wakes_and_drops_the_event():
+    events = TaskEvents()
+    event = events.subscribe("t1")
+    events.notify("t1")
+    assert event.is_set() and "t1" not in events._events
+    events.unsubscribe("t1")
+    assert not events._subscribers
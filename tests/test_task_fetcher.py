@@ -0,0 +1,45 @@
+import asyncio
+
+import httpx
+
+from app.services.http_client import HTTPClient
+from app.services.task_fetcher import TaskFetcher
+from tests.mock_server import quiz_1
+
+def test_atob_page_is_resolved_without_a_browser(monkeypatch):
+    html = asyncio.run(quiz_1())
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, html=html))
+    client = HTTPClient(transport=transport)
+    monkeypatch.setattr("app.services.task_fetcher.http_client", client)
+    fetcher = TaskFetcher()
+
+    async def scenario():
+        try:
+            return await fetcher.fetch("http://localhost:8001/quiz-1")
+        finally:
+            await client.stop()
+
+    page = asyncio.run(scenario())
+    assert page["tier"] == "decoded"
+    assert "Calculate the sum of 100 and 200" in page["text"]
+    assert page["submit_urls"] == ["http://localhost:8001/submit"]
+    assert fetcher.hit_rates() == {"http": 0.0, "decoded": 1.0, "browser": 0.0}
+
+def test_static_probe_is_not_retried(monkeypatch):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url)
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    client = HTTPClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr("app.services.task_fetcher.http_client", client)
+
+    async def scenario():
+        try:
+            return await TaskFetcher().fetch_static("http://localhost:8001/quiz-1")
+        finally:
+            await client.stop()
+
+    assert asyncio.run(scenario()) is None
+    assert len(attempts) == 1
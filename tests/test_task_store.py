@@ -0,0 +1,24 @@
+from app.services.task_store import MemoryTaskStore, SQLiteTaskStore, ABANDONED_ERROR
+
+def _age(store, task_id, seconds):
+    if isinstance(store, MemoryTaskStore):
+        store._tasks[task_id]["updated_at"] -= seconds
+    else:
+        store._execute("UPDATE tasks SET updated_at = updated_at - ? WHERE id = ?", (seconds, task_id))
+
+def test_tasks_left_running_by_a_dead_worker_are_failed_then_evicted(tmp_path):
+    for store in (MemoryTaskStore(), SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))):
+        store.stale_seconds, store.retention_seconds = 60, 3600
+        stale = store.create_task("a@x", "https://quiz.test/1")
+        store.update(stale, status="processing")
+        fresh = store.create_task("b@x", "https://quiz.test/2")
+        _age(store, stale, 120)
+
+        assert store.evict_expired() == 0
+        assert store.get_task(stale)["status"] == "failed"
+        assert store.get_task(stale)["error"] == ABANDONED_ERROR
+        assert store.get_task(fresh)["status"] == "queued"
+
+        _age(store, stale, 7200)
+        assert store.evict_expired() == 1
+        assert store.get_task(stale) is None